@@ -1,31 +1,35 @@
 import os
-import qdarktheme
-import pint
-from PyQt6.QtWidgets import QWidget
+from PyQt6.QtWidgets import QWidget, QApplication
+from PyQt6.QtCore import QStandardPaths
 from view.dock import DockManager
 from view.menu import MenuManager
 from view.window import MainWindow
-from view.widgets.results import ResultsWidget
-from view.widgets.graph import GraphWidget
 from view.widgets.namespace import NamespaceWidget
 from view.widgets.statusbar import StatusBarWidget
 from view.widgets.topbar import TopBarWidget
-from view.widgets.python import PythonWidget
 from view.widgets.object_table import ObjectTableWidget
-from view.widgets.plot import InteractiveGraph
 from view.editor.editor import PythonEditor, FunctionsEditor, EquationEditor, ConsoleEditor
 from eqsys.equationsystem import EquationSystem
+from eqsys.util import CompileCache
 from eqsys.solve.result import ResultsManager
 from eqsys.solve.solver_interface import SolverInterface
 from controller.controller import MainController, EquationSystemController
+from controller.util import StartupReport
 from configs.settings import SettingsManager
 from resources.css import QSS
 
 
 class MainApp(QWidget):
+    """
+    with lazy_docks the Graph, Plot, Results and Script docks are created when they are first shown,
+    so QtWebEngine, pyvis and pyqtgraph are not imported at startup
+    the time of each step is recorded in report
+    """
 
-    def __init__(self):
+    def __init__(self, lazy_docks=True, report: StartupReport = None):
         super().__init__()
+        self.lazy_docks = lazy_docks
+        self.report = report if report is not None else StartupReport()
         # todo: implement save eqsys and editor state
         # todo: implement saving configs with qsetting
         # todo: implmenet applying configs and theme
@@ -37,16 +41,27 @@ class MainApp(QWidget):
         #self.settings_manager.settings_changed.connect(self.update_settings)
         
         # apply theme
-        qdarktheme.setup_theme(additional_qss=QSS)
+        with self.report.measure('theme'):
+            import qdarktheme
+            qdarktheme.setup_theme(additional_qss=QSS)
         
-        self._setup_view()
-        self._setup_model()
-        self._setup_widgets()
-        self._setup_controller()
+        with self.report.measure('view'):
+            self._setup_view()
+        with self.report.measure('model'):
+            self._setup_model()
+        with self.report.measure('widgets'):
+            self._setup_widgets()
+        with self.report.measure('controller'):
+            self._setup_controller()
         self._apply_settings()
         
+        if not self.lazy_docks:
+            for dock_name in list(self.view.dock_manager.factories):
+                self.view.dock_manager.get_widget(dock_name)
+        
         # load content in editor
-        self.eqsys_controller.lines_manager.on_lines_changed()
+        with self.report.measure('load editor'):
+            self.eqsys_controller.lines_manager.on_lines_changed()
         
     def update_settings(self):
         # Update your app's configs here
@@ -78,16 +93,29 @@ class MainApp(QWidget):
         self.console = ConsoleEditor(self.view)
 
         # todo: Needs eqsys configs: cache and ureg
-        # setup eqsys
-        self.ureg = pint.UnitRegistry()
-        self.model = EquationSystem(self.ureg)
+        # compiled lines are kept between sessions, so reopening a model skips compilation
+        cache_dir = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.CacheLocation)
+        os.makedirs(cache_dir, exist_ok=True)
+        self.compile_cache = CompileCache(capacity=10000, path=os.path.join(cache_dir, 'compile_cache.pickle'))
+        self.compile_cache.load()
+        QApplication.instance().aboutToQuit.connect(self.compile_cache.save)
+        
+        # setup eqsys, the unit registry is created on first use
+        self.model = EquationSystem()
         
         # solver controller
         # todo: needs settings for float/scientific/digits
-        self.results_manager = ResultsManager()
+        # todo: memory limit from settings
+        # entries over 1 GB are memory mapped from temporary files, which are deleted on exit
+        self.results_manager = ResultsManager(memory_limit=2 ** 30)
+        QApplication.instance().aboutToQuit.connect(self.results_manager.close)
+        # rows are shown in batches while solving
+        self.results_manager.notify_interval = 0.1
         # todo: Needs solver configs: Solver, residual, iterations etc
+        # rows are journaled while solving, so a sweep which fails or is killed can be resumed
         self.solver_interface = SolverInterface(equation_system=self.model,
-                                                results_manager=self.results_manager)
+                                                results_manager=self.results_manager,
+                                                journal_directory=os.path.join(cache_dir, 'journals'))
     
     def _setup_widgets(self):
         # widgets listen for changes in model/interface etc. and applies changes to objects directly from widget
@@ -101,25 +129,50 @@ class MainApp(QWidget):
         # init widgets
         self.object_widget = ObjectTableWidget(self.model, self.view)
         self.namespace_widget = NamespaceWidget(self.model, self.namespace_edit, self.view)
-        self.graph_widget = GraphWidget(self.model, self.view)
-        self.plot_widget = InteractiveGraph(self.view)
-        self.python_widget = PythonWidget(self.model, self.results_manager, self.python_edit, self.view)
-        self.results_widget = ResultsWidget(self.model, self.results_manager, self.view)
 
         # set widgets/editors to docks
         self.view.dock_manager.set_dock_widget('Objects', self.object_widget)
         self.view.dock_manager.set_dock_widget('Namespace', self.namespace_widget)
-        self.view.dock_manager.set_dock_widget('Graph', self.graph_widget)
-        self.view.dock_manager.set_dock_widget('Results', self.results_widget)
-        self.view.dock_manager.set_dock_widget('Plot', self.plot_widget)
-        self.view.dock_manager.set_dock_widget('Script', self.python_widget)
         self.view.dock_manager.set_dock_widget('Output', self.console)
+        
+        # heavy widgets are created on first show
+        self.view.dock_manager.set_dock_factory('Graph', self._create_graph_widget)
+        self.view.dock_manager.set_dock_factory('Results', self._create_results_widget)
+        self.view.dock_manager.set_dock_factory('Plot', self._create_plot_widget)
+        self.view.dock_manager.set_dock_factory('Script', self._create_python_widget)
+
+    def _create_graph_widget(self):
+        with self.report.measure('dock: Graph'):
+            from view.widgets.graph import GraphWidget
+            self.graph_widget = GraphWidget(self.model, self.view)
+        return self.graph_widget
+
+    def _create_results_widget(self):
+        with self.report.measure('dock: Results'):
+            from view.widgets.results import ResultsWidget
+            self.results_widget = ResultsWidget(self.model, self.results_manager, self.view)
+            self.controller.set_results_widget(self.results_widget)
+        return self.results_widget
+
+    def _create_plot_widget(self):
+        with self.report.measure('dock: Plot'):
+            from view.widgets.plot import InteractiveGraph
+            self.plot_widget = InteractiveGraph(self.view)
+        return self.plot_widget
+
+    def _create_python_widget(self):
+        with self.report.measure('dock: Script'):
+            from view.widgets.python import PythonWidget
+            self.python_widget = PythonWidget(self.model, self.results_manager, self.python_edit, self.view)
+        return self.python_widget
 
     def _setup_controller(self):
         self.eqsys_controller = EquationSystemController(equation_system=self.model,
-                                                         equation_editor=self.equation_edit)
+                                                         equation_editor=self.equation_edit,
+                                                         compile_cache=self.compile_cache)
         self.controller = MainController(top_bar=self.top_bar_widget,
                                          status_bar=self.status_bar_widget,
+                                         results_widget=None,
                                          view=self.view,
                                          eqsys_controller=self.eqsys_controller,
                                          solver_interface=self.solver_interface)
@@ -0,0 +1,98 @@
+"""
+Edit latency of the LinesManager against document size
+
+Run from the repository root:
+    python -m benchmarks.bench_lines
+
+For every document size a model of chained equations is loaded into the equation editor,
+and the time of single edits (typing a character, inserting and deleting a line) is measured
+through the editor -> LinesManager -> EquationSystem path.
+The editor column is the cost of typing in an editor without a LinesManager attached (Scintilla itself),
+the legacy column is the cost of reading all lines and running difflib over the whole document,
+which is what the LinesManager did on every change in line count.
+"""
+import os
+import sys
+import time
+import difflib
+import statistics
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication
+import pint
+from view.editor.editor import EquationEditor
+from eqsys.equationsystem import EquationSystem
+from controller.controller import EquationSystemController
+
+SIZES = [100, 1000, 5000, 10000]
+REPEATS = 50
+
+
+def make_model(size: int) -> str:
+    return "\n".join(f"x{i} == x{i + 1} + {i}" for i in range(size))
+
+
+def measure(edit, repeats=REPEATS) -> float:
+    """ median time of an edit in milliseconds """
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        edit(i)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def bench(size: int) -> dict:
+    editor = EquationEditor()
+    equation_system = EquationSystem(pint.UnitRegistry())
+    # parse on the gui thread, so every edit is measured all the way to the equation system
+    controller = EquationSystemController(equation_system, editor, threaded=False)
+    lines_manager = controller.lines_manager
+
+    editor.setText(make_model(size))
+    lines_manager.on_lines_changed()
+    middle = size // 2
+
+    def type_character(i):
+        editor.insertAt(str(i % 10), middle, editor.lineLength(middle) - 1)
+
+    def insert_line(i):
+        editor.insertAt(f"y{i} == {i}\n", middle, 0)
+
+    def delete_line(i):
+        editor.setSelection(middle, 0, middle + 1, 0)
+        editor.removeSelectedText()
+
+    detached_editor = EquationEditor()
+    detached_editor.setText(make_model(size))
+
+    def type_character_detached(i):
+        detached_editor.insertAt(str(i % 10), middle, detached_editor.lineLength(middle) - 1)
+
+    def legacy_diff(i):
+        new_content = [editor.text(n).rstrip('\n').strip() for n in range(editor.lines())]
+        list(difflib.ndiff(lines_manager.previous_state, new_content))
+
+    return {
+        'type': measure(type_character),
+        'insert line': measure(insert_line),
+        'delete line': measure(delete_line),
+        'editor': measure(type_character_detached),
+        'legacy diff': measure(legacy_diff, repeats=5),
+    }
+
+
+def main():
+    app = QApplication(sys.argv)
+    columns = ['type', 'insert line', 'delete line', 'editor', 'legacy diff']
+    print(f"{'lines':>8} " + " ".join(f"{column + ' [ms]':>18}" for column in columns))
+    for size in SIZES:
+        result = bench(size)
+        # events posted by the editors of this size
+        app.processEvents()
+        print(f"{size:>8} " + " ".join(f"{result[column]:>18.3f}" for column in columns))
+
+
+if __name__ == '__main__':
+    main()
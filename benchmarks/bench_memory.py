@@ -0,0 +1,53 @@
+"""
+Memory of a loaded model against model size
+
+Run from the repository root:
+    python -m benchmarks.bench_memory
+
+For every model size the lines are loaded through the LinesManager into an EquationSystem,
+and the memory allocated by the lines manager, the compile cache and the equation system is measured with tracemalloc.
+The normal column keeps the syntax trees, the compact column drops them after compiling.
+"""
+import gc
+import tracemalloc
+from eqsys.equationsystem import EquationSystem
+from eqsys.lines import LinesManager, connect_lines_manager
+from eqsys.util import CompileCache
+
+SIZES = [1000, 10000, 50000]
+
+
+def make_model(size: int) -> list[str]:
+    parameters = [f"k{i} = {i}" for i in range(size // 100)]
+    equations = [f"x{i} == x{i + 1} * k{i // 100} + sin(y{i % 100}) / 2" for i in range(size)]
+    return parameters + equations
+
+
+def bench(size: int, compact: bool) -> float:
+    """ bytes per line """
+    lines = make_model(size)
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+
+    equation_system = EquationSystem()
+    lines_manager = LinesManager(compile_cache=CompileCache(capacity=2 * size), compact=compact)
+    connect_lines_manager(lines_manager, equation_system)
+    lines_manager.set_lines(lines)
+
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return used / len(lines)
+
+
+def main():
+    columns = ['normal', 'compact']
+    print(f"{'lines':>8} " + " ".join(f"{column + ' [B/line]':>18}" for column in columns))
+    for size in SIZES:
+        result = {'normal': bench(size, compact=False), 'compact': bench(size, compact=True)}
+        print(f"{size:>8} " + " ".join(f"{result[column]:>18.0f}" for column in columns))
+
+
+if __name__ == '__main__':
+    main()
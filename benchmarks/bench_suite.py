@@ -0,0 +1,175 @@
+"""
+Time of each stage of the solving pipeline on synthetic models
+
+Run from the repository root:
+    python -m benchmarks.bench_suite --out bench.json
+    python -m benchmarks.bench_suite --models chain,wide_grid --sizes 500,5000 --out bench.json
+
+For every model (see benchmarks.models) the stages are timed separately:
+    ingest      lines -> LinesManager -> EquationSystem, with an empty compile cache
+    compile     parsing and compiling every line with the Factory of a LineParser, with an empty compile cache
+    blocking    EquationSystem.blocking()
+    plan        SolvePlan.compile
+    grid        iterating the grid points of the plan
+    residual    one evaluation of the residuals of every block at the starting guesses
+    jacobian    one jacobian (autograd) of every block at the starting guesses
+    solve       SolverInterface.solve of the whole plan
+The results are written as JSON, one record per model and size, so runs of different versions can be compared.
+A stage which fails is recorded with its error and the later stages of the model are skipped.
+"""
+import os
+import sys
+import json
+import importlib
+import time
+import platform
+import argparse
+import subprocess
+from benchmarks.models import MODELS, make_model, Model
+from eqsys.equationsystem import EquationSystem
+from eqsys.lines import LinesManager, LineParser, connect_lines_manager
+from eqsys.util import CompileCache
+from eqsys.solve.plan import SolvePlan
+from eqsys.solve.result import ResultsManager
+from eqsys.solve.solver_interface import SolverInterface
+
+STAGES = ['ingest', 'compile', 'blocking', 'plan', 'grid', 'residual', 'jacobian', 'solve']
+
+
+class StageTimer:
+    """ times the stages of a model, the first error stops the stages which follow """
+
+    def __init__(self):
+        self.stages = {}
+        self.error = None
+
+    def run(self, stage: str, func, *args):
+        if self.error is not None:
+            return None
+        start = time.perf_counter()
+        try:
+            result = func(*args)
+        except Exception as e:
+            self.error = {'stage': stage, 'error': f"{type(e).__name__}: {e}"}
+            return None
+        self.stages[stage] = time.perf_counter() - start
+        return result
+
+
+def ingest(model: Model) -> EquationSystem:
+    equation_system = EquationSystem()
+    equation_system.namespace = model.load_namespace()
+    equation_system.namespace_source = model.namespace
+    lines_manager = LinesManager(compile_cache=CompileCache(capacity=2 * len(model.lines)))
+    connect_lines_manager(lines_manager, equation_system)
+    lines_manager.set_lines(model.lines)
+    return equation_system
+
+
+def compile_lines(model: Model) -> None:
+    parser = LineParser(CompileCache(capacity=2 * len(model.lines)))
+    for line in model.lines:
+        parser.parse(line)
+
+
+def iterate_grid(plan: SolvePlan) -> int:
+    return sum(1 for _ in plan.grid())
+
+
+def residual_functions(plan: SolvePlan) -> list:
+    """ the residual function of every block and its starting guesses, at the first grid point """
+    namespace = dict(plan.namespace)
+    variable_namespace = dict(zip(plan.variables, plan.x0.tolist()))
+    variable_namespace.update(next(plan.grid()))
+    functions = []
+    for block in plan.blocks:
+        x0, _, _ = SolverInterface.variable_info(plan, list(block.variables))
+        functions.append((SolverInterface.create_residual_func(block.residuals, block.variables, namespace, variable_namespace), x0))
+    return functions
+
+
+def evaluate_residuals(functions: list) -> None:
+    for residual_func, x0 in functions:
+        residual_func(x0)
+
+
+def evaluate_jacobians(functions: list) -> None:
+    from autograd import jacobian
+    for residual_func, x0 in functions:
+        jacobian(residual_func)(x0)
+
+
+def solve(equation_system: EquationSystem, plan: SolvePlan) -> None:
+    results_manager = ResultsManager()
+    solver = SolverInterface(equation_system, results_manager)
+    errors = []
+    solver.solve_error.connect(lambda error, *args: errors.append(error))
+    solver.solve(plan=plan)
+    results_manager.close()
+    if errors:
+        raise RuntimeError(errors[0])
+
+
+def bench(model: Model) -> dict:
+    timer = StageTimer()
+    equation_system = timer.run('ingest', ingest, model)
+    timer.run('compile', compile_lines, model)
+    blocks = timer.run('blocking', lambda: equation_system.blocking())
+    plan = timer.run('plan', SolvePlan.compile, equation_system)
+    timer.run('grid', iterate_grid, plan)
+    # the solvers are imported on first use, which is not part of the stages
+    importlib.import_module('autograd')
+    importlib.import_module('scipy.optimize')
+    functions = residual_functions(plan) if plan is not None else None
+    timer.run('residual', evaluate_residuals, functions)
+    timer.run('jacobian', evaluate_jacobians, functions)
+    timer.run('solve', solve, equation_system, plan)
+
+    return {'model': model.name,
+            'size': model.size,
+            'lines': len(model.lines),
+            'blocks': len(blocks) if blocks is not None else None,
+            'grid_points': plan.grid_size if plan is not None else None,
+            'stages': timer.stages,
+            'error': timer.error}
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--models', default=','.join(MODELS), help=f"comma separated, of {', '.join(MODELS)}")
+    parser.add_argument('--sizes', help='comma separated sizes, each model is run at every size, default the size of the model')
+    parser.add_argument('--out', help='json file for the results')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',')] if args.sizes else [None]
+    results = []
+    print(f"{'model':>20} {'size':>7} " + " ".join(f"{stage:>9}" for stage in STAGES))
+    for name in args.models.split(','):
+        for size in sizes:
+            result = bench(make_model(name, size))
+            results.append(result)
+            times = [f"{result['stages'][stage]:>9.4f}" if stage in result['stages'] else f"{'-':>9}" for stage in STAGES]
+            print(f"{result['model']:>20} {result['size']:>7} " + " ".join(times))
+            if result['error'] is not None:
+                print(f"{'':>20} {result['error']['stage']} failed: {result['error']['error']}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'environment': environment(), 'stages': STAGES, 'results': results}, f, indent=2)
+    return 1 if any(result['error'] is not None for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
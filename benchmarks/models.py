@@ -0,0 +1,85 @@
+"""
+Synthetic equation systems for the benchmarks
+
+Every generator takes a size and returns a Model: the lines as written in the equation window
+and the source of the namespace window. Functions in the namespace use autograd.numpy,
+so the residuals can be differentiated by the Newton solver.
+"""
+
+NAMESPACE = "import autograd.numpy as np\n"
+
+
+class Model:
+    def __init__(self, name: str, size: int, lines: list[str], namespace: str = NAMESPACE):
+        self.name = name
+        self.size = size
+        self.lines = lines
+        self.namespace = namespace
+
+    def __repr__(self):
+        return f"Model(name={self.name}, size={self.size}, lines={len(self.lines)})"
+
+    def load_namespace(self) -> dict:
+        namespace = {}
+        exec(compile(self.namespace, f'<{self.name}>', 'exec'), namespace)
+        del namespace['__builtins__']
+        return namespace
+
+
+def chain(size: int) -> Model:
+    """ explicit chain, every variable is solved from the one before: size blocks of one equation """
+    lines = ["x0 == 1"] + [f"x{i} == x{i - 1} + {i}" for i in range(1, size)]
+    return Model('chain', size, lines)
+
+
+def nonlinear_scc(size: int) -> Model:
+    """ one block of size coupled nonlinear equations, each variable depends on the next one """
+    lines = [f"x{i} == 0.5 * np.cos(x{(i + 1) % size}) + 0.01 * {i}" for i in range(size)]
+    return Model('nonlinear_scc', size, lines)
+
+
+def small_blocks(size: int) -> Model:
+    """ size independent blocks of two coupled equations """
+    lines = []
+    for i in range(size):
+        lines.append(f"a{i} + b{i} == {i}")
+        lines.append(f"a{i} - b{i} ** 3 == np.sin({i})")
+    return Model('small_blocks', size, lines)
+
+
+def wide_grid(size: int) -> Model:
+    """ a small system solved at size grid points """
+    lines = [f"p = list(range(1, {size + 1}))",
+             "q = [0.5, 1.5]",
+             "x == p * q + y",
+             "y ** 2 == x + 1",
+             "z == x * y"]
+    return Model('wide_grid', size, lines)
+
+
+def expensive_functions(size: int) -> Model:
+    """ chain of size equations calling a namespace function which is slow to evaluate """
+    namespace = NAMESPACE + (
+        "def expensive(v):\n"
+        "    s = v\n"
+        "    for k in range(200):\n"
+        "        s = 0.5 * np.sin(s) + 0.5 * v\n"
+        "    return s\n"
+    )
+    lines = ["x0 == 1"] + [f"x{i} == expensive(x{i - 1}) + 1" for i in range(1, size)]
+    return Model('expensive_functions', size, lines, namespace)
+
+
+# generator and default size
+MODELS = {
+    'chain': (chain, 2000),
+    'nonlinear_scc': (nonlinear_scc, 50),
+    'small_blocks': (small_blocks, 500),
+    'wide_grid': (wide_grid, 500),
+    'expensive_functions': (expensive_functions, 100),
+}
+
+
+def make_model(name: str, size: int = None) -> Model:
+    generator, default_size = MODELS[name]
+    return generator(size if size is not None else default_size)
@@ -0,0 +1,173 @@
+"""
+Solves an equation file without the GUI
+
+    python cli.py solve model.txt --namespace ns.py --out results.npz
+
+The equation file is written like the equation window, one equation or parameter per line.
+The namespace file is python, like the namespace window.
+Results are written to .npz (data, variables, information_*, block_times), .csv, .parquet or .arrow,
+the exit code is 1 if solving fails and 3 if runs failed (kept as nan rows with their failure code).
+"""
+import sys
+import time
+import argparse
+import traceback
+import numpy as np
+import pint
+from eqsys.equationsystem import EquationSystem
+from eqsys.solve.result import ResultsManager, ResultsEntry
+from eqsys.solve.export import export_entry, export_npz
+from eqsys.solve.solver_interface import SolverInterface
+from eqsys.solve.profiler import SolveProfiler
+from eqsys.util import CompileCache
+from eqsys.lines import LinesManager, connect_lines_manager
+
+
+# exit codes, 2 is a usage error (argparse)
+EXIT_ERROR = 1
+EXIT_RUNS_FAILED = 3
+
+
+def load_namespace(path: str) -> tuple[dict, str]:
+    """ executes the namespace file, like the namespace window does, returns the namespace and the source """
+    namespace = {}
+    with open(path, 'r') as f:
+        source = f.read()
+    exec(compile(source, path, 'exec'), namespace)
+    del namespace['__builtins__']
+    return namespace, source
+
+
+def write_results(path: str, entry: ResultsEntry, block_times: list[tuple]):
+    """ .npz also holds the block times """
+    if path.lower().endswith('.npz'):
+        export_npz(entry, path, block_times=np.array(block_times, dtype=float).reshape(-1, 4))
+    else:
+        export_entry(entry, path)
+
+
+def print_block_times(block_times: list[tuple], file=sys.stderr):
+    """ total time per block over all runs """
+    totals = {}
+    for grid_index, block_index, n_variables, seconds in block_times:
+        runs, size, total = totals.get(block_index, (0, n_variables, 0.0))
+        totals[block_index] = (runs + 1, size, total + seconds)
+
+    print(f"{'block':>6} {'variables':>10} {'runs':>6} {'total [s]':>10}", file=file)
+    for block_index, (runs, size, total) in sorted(totals.items()):
+        print(f"{block_index + 1:>6} {size:>10} {runs:>6} {total:>10.4f}", file=file)
+
+
+def solve(args) -> int:
+    compile_cache = CompileCache(path=args.cache)
+    if args.cache:
+        compile_cache.load()
+
+    equation_system = EquationSystem(pint.UnitRegistry())
+    lines_manager = LinesManager(compile_cache=compile_cache, compact=args.compact)
+    connect_lines_manager(lines_manager, equation_system)
+
+    try:
+        if args.namespace:
+            equation_system.namespace, equation_system.namespace_source = load_namespace(args.namespace)
+        with open(args.model, 'r') as f:
+            lines_manager.set_lines(f.read().splitlines())
+    except Exception:
+        traceback.print_exc()
+        return EXIT_ERROR
+
+    if args.cache:
+        compile_cache.save()
+
+    print(f"{len(equation_system.equations)} equations, {len(equation_system.variables)} variables, "
+          f"{len(equation_system.parameters)} parameters, {equation_system.grid.size()} runs", file=sys.stderr)
+
+    # with a results directory the rows are written to memory mapped files during the solve
+    results_manager = ResultsManager(directory=args.results_dir, memory_limit=0 if args.results_dir else None)
+    solver_interface = SolverInterface(equation_system=equation_system,
+                                       results_manager=results_manager,
+                                       journal_directory=args.journal)
+    solver_interface.set_solver(args.method)
+    solver_interface.settings['tolerance'] = args.tol
+    solver_interface.settings['max_iter'] = args.max_iter
+    solver_interface.settings['block_time'] = args.block_time
+    solver_interface.settings['point_time'] = args.point_time
+    solver_interface.settings['fallbacks'] = [int(method) for method in args.fallbacks.split(',') if method.strip()]
+    solver_interface.settings['residual_tolerance'] = args.residual_tol
+    solver_interface.settings['race'] = [int(method) for method in args.race.split(',') if method.strip()]
+    solver_interface.settings['krylov_size'] = args.krylov_size
+    solver_interface.settings['krylov_preconditioner'] = not args.no_preconditioner
+
+    errors = []
+    solver_interface.solve_error.connect(lambda message, widgets: errors.append(message))
+    if args.verbose:
+        solver_interface.status_interval = 1.0
+        solver_interface.solve_status.connect(lambda message: print(message, file=sys.stderr))
+    if args.profile:
+        solver_interface.profiler = SolveProfiler()
+
+    start_time = time.perf_counter()
+    solver_interface.solve(resume=args.resume)
+    elapsed_time = time.perf_counter() - start_time
+
+    entry_name = next(reversed(results_manager.entries), None)
+    if entry_name is not None:
+        entry = results_manager.entries[entry_name]
+        write_results(args.out, entry, solver_interface.block_times)
+    results_manager.close()
+
+    if args.profile:
+        solver_interface.profiler.save_trace(args.profile)
+        print(solver_interface.profiler.summary(), file=sys.stderr)
+    else:
+        print_block_times(solver_interface.block_times)
+    for message in errors:
+        print(f"Solve failed: {message}", file=sys.stderr)
+    if solver_interface.progress.points_failed:
+        print(f"{solver_interface.progress.points_failed} of {solver_interface.progress.points_total} runs failed, "
+              f"see the failure and failed_block columns", file=sys.stderr)
+    print(f"{'Failed' if errors else 'Finished'} in {elapsed_time:.2f} seconds", file=sys.stderr)
+    if errors:
+        return EXIT_ERROR
+    return EXIT_RUNS_FAILED if solver_interface.progress.points_failed else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='pies', description='Solves linear and non-linear equation systems')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    solve_parser = commands.add_parser('solve', help='solve an equation file')
+    solve_parser.add_argument('model', help='equation file, one equation or parameter per line')
+    solve_parser.add_argument('--namespace', help='python file with the namespace')
+    solve_parser.add_argument('--out', default='results.npz', help='.npz, .csv, .parquet or .arrow file for the results')
+    solve_parser.add_argument('--method', type=int, default=1, help='solver: 0 newton-raphson, 1 least squares, 2 minimize, 3 trust region, 4 scaled least squares, '
+                                   '5 multi-start, 6 newton krylov, 7 fixed point, -2 race the --race methods')
+    solve_parser.add_argument('--fallbacks', default='3,4,5',
+                              help='methods tried in order when a block fails: 3 trust region, 4 scaled least squares, '
+                                   '5 multi-start, empty for none')
+    solve_parser.add_argument('--race', default='0,1,3', help='methods raced on each block with --method -2, '
+                                                               'the winner is tried first at the following runs')
+    solve_parser.add_argument('--krylov-size', type=int, help='blocks of at least this many unknowns are solved first with newton krylov')
+    solve_parser.add_argument('--no-preconditioner', action='store_true', help='newton krylov without the incomplete LU preconditioner')
+    solve_parser.add_argument('--tol', type=float, default=1e-10)
+    solve_parser.add_argument('--residual-tol', type=float, default=1e-6, help='largest residual norm of an accepted block solution')
+    solve_parser.add_argument('--max-iter', type=int, default=500)
+    solve_parser.add_argument('--block-time', type=float, help='seconds a block may take, the rest of the run is left unsolved')
+    solve_parser.add_argument('--point-time', type=float, help='seconds a run may take')
+    solve_parser.add_argument('--cache', help='compile cache file, loaded before and saved after parsing')
+    solve_parser.add_argument('--compact', action='store_true', help='drop the syntax trees after compiling, for large models')
+    solve_parser.add_argument('--results-dir', help='scratch directory for results too large for memory')
+    solve_parser.add_argument('--journal', help='directory where solved rows are journaled, for resuming a sweep')
+    solve_parser.add_argument('--resume', action='store_true', help='skip the runs journaled by an unfinished sweep')
+    solve_parser.add_argument('--profile', help='chrome trace file (chrome://tracing, ui.perfetto.dev) of the blocks and namespace functions, '
+                                                'prints the slowest blocks and functions')
+    solve_parser.add_argument('--verbose', action='store_true', help='print the progress every second')
+
+    args = parser.parse_args(argv)
+    if args.command == 'solve':
+        return solve(args)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,27 @@
+from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
+from eqsys.observer import BoundSignal
+
+
+class QtAdapter(QObject):
+    """
+    Connects signals of the qt-free equation system and solver to slots in the gui
+    The slot is called in the thread of the adapter (the gui thread), also when the signal is emitted from the solver thread
+    """
+    forward = pyqtSignal(object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # queued when emitted from another thread, direct when emitted from the gui thread
+        self.forward.connect(self._call)
+
+    def connect(self, signal: BoundSignal, slot):
+        """ returns the forwarding function, which can be used to disconnect again """
+        def forward(*args):
+            self.forward.emit(slot, args)
+
+        signal.connect(forward)
+        return forward
+
+    @pyqtSlot(object, object)
+    def _call(self, slot, args):
+        slot(*args)
@@ -3,33 +3,33 @@ from view.window import MainWindow
 from view.editor.editor import EquationEditor
 from eqsys.equationsystem import EquationSystem
 from eqsys.solve.solver_interface import SolverInterface
+from eqsys.lines import connect_lines_manager
 from controller.util import SolverThread
 from controller.error import ErrorHandler
-from controller.lines import LinesManager
+from controller.lines import EditorLinesManager
+from controller.adapter import QtAdapter
 
 
 class EquationSystemController(QObject):
     """
     Handles the communication between the editor and the equation system
     Error_handler sets indicators in editors 
+    Without an editor, the lines are set through lines_manager.set_lines
     """
 
     def __init__(self,
                  equation_system: EquationSystem,
-                 equation_editor: EquationEditor,
+                 equation_editor: EquationEditor = None,
+                 threaded=True,
+                 compile_cache=None,
                  parent=None):
         super().__init__(parent)
 
         # connect lines manager to equation system
         self.equation_system = equation_system
         self.equation_editor = equation_editor
-        self.lines_manager = LinesManager(self.equation_editor)
-        
-        self.lines_manager.add_equation.connect(self.equation_system.insert_equation)
-        self.lines_manager.remove_equation.connect(self.equation_system.delete_equation)
-
-        self.lines_manager.add_parameter.connect(self.equation_system.insert_parameter)
-        self.lines_manager.remove_parameter.connect(self.equation_system.delete_parameter)
+        self.lines_manager = EditorLinesManager(self.equation_editor, threaded=threaded, compile_cache=compile_cache)
+        connect_lines_manager(self.lines_manager, self.equation_system)
         
         # setup equation error handling
         # self.error_handler = ErrorHandler(self.equation_editor)
@@ -42,11 +42,16 @@ class EquationSystemController(QObject):
     
 
 class MainController(QObject):
-    """handles communication between buttons/status bar and solving thread"""
+    """
+    handles communication between buttons/status bar and solving thread
+    signals from the solver are emitted in the solving thread, the adapter calls the widgets in the gui thread
+    results_widget can be None and set with set_results_widget when it is created
+    """
 
     def __init__(self,
                  top_bar,
                  status_bar,
+                 results_widget,
                  view: MainWindow,
                  eqsys_controller: EquationSystemController,
                  solver_interface: SolverInterface):
@@ -54,40 +59,70 @@ class MainController(QObject):
         super().__init__()
         self.top_bar = top_bar
         self.status_bar = status_bar
+        self.results_widget = None
         self.view = view
         self.eqsys_controller = eqsys_controller
         self.solver_interface = solver_interface
+        self.adapter = QtAdapter(self)
         
         # signal from top bar buttons
         self.top_bar.solve_button.clicked.connect(self.run_solve)
+        self.top_bar.resume_button.clicked.connect(self.resume_solve)
         self.top_bar.stop_button.clicked.connect(self.stop_solve)
 
         # todo: add output from solver
         # send errors in solving to console
-        self.solver_interface.solve_error.connect(self.view.console_message)
+        self.adapter.connect(self.solver_interface.solve_error, self.view.console_message)
+        self.adapter.connect(self.solver_interface.solve_status, self.status_bar.update_solve_status)
+        if results_widget is not None:
+            self.set_results_widget(results_widget)
         
         # disable stop button
         self.top_bar.stop_button.setEnabled(False)
 
+    def set_results_widget(self, results_widget):
+        """ connects the results widget and shows the results solved before it was created """
+        self.results_widget = results_widget
+        results_manager = self.solver_interface.results_manager
+        self.adapter.connect(results_manager.entry_created, self.results_widget.on_entry_created)
+        self.adapter.connect(results_manager.entry_deleted, self.results_widget.on_entry_deleted)
+        self.adapter.connect(results_manager.entry_renamed, self.results_widget.on_entry_renamed)
+        self.adapter.connect(results_manager.rows_committed, self.results_widget.on_rows_committed)
+        self.results_widget.update_tabs()
+
     @pyqtSlot()
-    def run_solve(self):
+    def run_solve(self, resume=False):
+        # the plan is compiled here, so the solver thread never reads the equation system while it is edited
+        try:
+            plan = self.solver_interface.compile_plan()
+        except Exception as e:
+            self.view.console_message(str(e), ['Output'])
+            return
+
         self.status_bar.start_timer()
         self.top_bar.solve_button.setEnabled(False)
+        self.top_bar.resume_button.setEnabled(False)
         self.top_bar.stop_button.setEnabled(True)
         
-        self.solver_thread = SolverThread(self.solver_interface)
+        self.solver_thread = SolverThread(self.solver_interface, plan=plan, resume=resume)
         # signals from solver thread
         self.solver_thread.finished.connect(self.status_bar.stop_timer)
         self.solver_thread.finished.connect(self.enable_solve_button)
         
         self.solver_thread.start()
     
+    @pyqtSlot()
+    def resume_solve(self):
+        """ solves the grid points which were not journaled by the last sweep of the system """
+        self.run_solve(resume=True)
+
     def enable_solve_button(self):
         self.top_bar.solve_button.setEnabled(True)
+        self.top_bar.resume_button.setEnabled(True)
         self.top_bar.stop_button.setEnabled(False)
         
     @pyqtSlot()
     def stop_solve(self):
-        # todo: not working
-        self.solver_thread.exit()
-        print('thread ended')
+        """ the solve stops at the next check, the rows solved so far are kept """
+        self.solver_interface.cancel_token.cancel()
+        self.top_bar.stop_button.setEnabled(False)
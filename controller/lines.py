@@ -1,130 +1,123 @@
-import ast
-import difflib
-from collections import defaultdict
-from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
+from PyQt6.QtCore import QObject, QThread, QTimer, QCoreApplication, pyqtSignal, pyqtSlot
+from PyQt6.Qsci import QsciScintilla
 from view.editor.editor import EquationEditor
-from eqsys.util import Counter
+from eqsys.util import CompileCache
+from eqsys.lines import LinesManager, LineParser
 
 
-class LinesManager(QObject):
+class ParseWorker(QObject):
+    """ parses lines in a background thread """
+    parsed = pyqtSignal(int, object)
+
+    def __init__(self, compile_cache: CompileCache = None):
+        super().__init__()
+        self.parser = LineParser(compile_cache)
+
+    @pyqtSlot(int, object)
+    def parse(self, request_id: int, lines: list[str]):
+        self.parsed.emit(request_id, {line: self.parser.parse(line) for line in lines})
+
+
+class EditorLinesManager(LinesManager, QObject):
     """
-    keeps a count of unique lines
-    keeps a count to unique parsed lines 
-    emits signals on eq/param added/removed
+    lines manager for the equation editor
+    driven by the modification notifications of the editor, so only the lines touched by an edit are re-read
+
+    unique lines which are added or removed are collected and parsed in a worker thread after the editor
+    has been idle for delay ms, the results are applied in one update, so bursts (paste, undo) are coalesced
+    with threaded=False lines are parsed and applied right away
     """
-    add_equation = pyqtSignal(str, object)
-    remove_equation = pyqtSignal(str)
-    add_parameter = pyqtSignal(str, object)
-    remove_parameter = pyqtSignal(str)
+    request_parse = pyqtSignal(int, object)
 
-    def __init__(self, editor: EquationEditor, parent=None):
-        super().__init__(parent)
+    def __init__(self, editor: EquationEditor = None, parent=None, threaded=True, delay=150, compile_cache: CompileCache = None):
+        super().__init__(compile_cache=compile_cache, parent=parent)
         self.editor = editor
-                
-        self.editor.linesChanged.connect(self.on_lines_changed)
-        self.editor.textChanged.connect(self.on_line_changed)
-
-        self.previous_state = []
-        
-        # keeps a count of unique lines in the editor
-        # signals when a name is added or removed from the count
-        # key name is the line str 
-        self.line_counter = Counter()
-        self.line_counter.name_added.connect(self.unique_line_added)
-        self.line_counter.name_removed.connect(self.unique_line_removed)
-        
-        # keeps a count of unique parsed lines
-        # key name is the unparsed line
-        self.parsed_line_counter = Counter()
-        self.parsed_line_counter.name_added.connect(self.unique_parsed_line_added)
-        self.parsed_line_counter.name_removed.connect(self.unique_parsed_line_removed)
-
-        # map from unique lines to parsed lines
-        # multiple lines could result in the same line; a =1, a=1
-        self.map_line_to_parsed = defaultdict(str)
-
-    @pyqtSlot(str)
-    def unique_parsed_line_added(self, name):
-        """ when a unique parsed line is added to the parsed_line_counter """        
-        tree = self.parsed_line_counter.get_object(name)
-        
-        # Comparison
-        if isinstance(tree.body[0].value, ast.Compare):
-            ast_expression = ast.Expression(tree.body[0].value)
-            self.add_equation.emit(name, ast_expression)
-            
-        # Assignment
-        elif isinstance(tree.body[0], ast.Assign):
-            parameter_name = ast.unparse(tree.body[0].targets[0])
-            self.add_parameter.emit(parameter_name, tree.body[0])
-            
-    @pyqtSlot(str)
-    def unique_parsed_line_removed(self, name):
-        """ when a unique parsed line is removed from the parsed_line_counter """
-        tree = self.parsed_line_counter.get_object(name)
-
-        # Comparison
-        if isinstance(tree.body[0].value, ast.Compare):
-            self.remove_equation.emit(name)
-
-        # Assignment
-        elif isinstance(tree.body[0], ast.Assign):
-            parameter_name = ast.unparse(tree.body[0].targets[0])
-            self.remove_parameter.emit(parameter_name)
-            
-    @pyqtSlot(str)
-    def unique_line_added(self, name):
-        """ new unique line added in editor, try to parse it and add to unique parsed lines"""
-        try:
-            # todo: issue with empty and isistance check
-            tree = ast.parse(name, mode='exec')
-            # only add assignments and comparisons
-            if isinstance(tree.body[0].value, ast.Compare) or isinstance(tree.body[0], ast.Assign):
-                equation_string = ast.unparse(tree)
-                
-                # increase counter and associate expression object with equation_string
-                self.parsed_line_counter.insert(equation_string, tree)
-    
-                # add unique line name to map
-                self.map_line_to_parsed[name] = equation_string
-            
-        except SyntaxError as e:
-            pass
-            # print(e.text, " " * (e.offset-2) + "^", str(e))
-
-    @pyqtSlot(str)
-    def unique_line_removed(self, name):
-        """ line removed from editor, check if it needs to be deleted """
-        if name in self.map_line_to_parsed:
-            equation_string = self.map_line_to_parsed.pop(name)
-            self.parsed_line_counter.delete(equation_string)
+
+        if self.editor is not None:
+            self.editor.SCN_MODIFIED.connect(self.on_modified)
+
+        # the update which is being parsed in the worker
+        self.in_flight = None
+        self.request_id = 0
+
+        # the parser on this thread and in the worker share the compile cache
+        self.threaded = threaded
+        if self.threaded:
+            self.timer = QTimer(self)
+            self.timer.setSingleShot(True)
+            self.timer.setInterval(delay)
+            self.timer.timeout.connect(self.flush)
+
+            self.worker_thread = QThread(self)
+            self.worker = ParseWorker(self.compile_cache)
+            self.worker.moveToThread(self.worker_thread)
+            self.request_parse.connect(self.worker.parse)
+            self.worker.parsed.connect(self.on_parsed)
+            self.worker_thread.start()
+
+            if QCoreApplication.instance() is not None:
+                QCoreApplication.instance().aboutToQuit.connect(self.stop)
+
+    def schedule(self):
+        """ restarts the idle timer, or updates right away if not threaded """
+        if self.threaded:
+            self.timer.start()
+        else:
+            self.flush()
 
     @pyqtSlot()
-    def on_line_changed(self):
-        """ updates the counter for a single line """
-        current_line_num = self.editor.getCursorPosition()[0]
-        old_line = self.previous_state[current_line_num].rstrip('\n')
-        new_line = self.editor.text(current_line_num).rstrip('\n').strip()
-
-        if old_line != new_line:
-            self.line_counter.delete(old_line)
-            self.line_counter.insert(new_line)
-        
-        self.previous_state[current_line_num] = new_line
+    def flush(self):
+        """ sends the pending lines to be parsed, only one update is parsed at a time so they are applied in order """
+        if not self.threaded:
+            super().flush()
+            return
+
+        if self.in_flight is not None or not self.pending:
+            return
+
+        update, self.pending = self.pending, {}
+        self.in_flight = update
+        self.request_id += 1
+        self.request_parse.emit(self.request_id, [line for line, added in update.items() if added])
+
+    @pyqtSlot(int, object)
+    def on_parsed(self, request_id: int, results: dict):
+        update, self.in_flight = self.in_flight, None
+        self.apply(update, results)
+
+        # lines changed while parsing have already waited
+        self.flush()
+
+    @pyqtSlot()
+    def stop(self):
+        """ stops the worker thread """
+        if self.threaded:
+            self.timer.stop()
+            self.worker_thread.quit()
+            self.worker_thread.wait()
+
+    def _line(self, line_num: int) -> str:
+        return self.editor.text(line_num).rstrip('\n').strip()
+
+    def on_modified(self, position: int, modification_type: int, text, length: int, lines_added: int, *args):
+        """
+        updates the counter for the lines touched by a text insertion or deletion
+        an insertion replaces the line at position with lines_added + 1 lines, a deletion replaces -lines_added + 1 lines with one line
+        """
+        if not modification_type & (QsciScintilla.SC_MOD_INSERTTEXT | QsciScintilla.SC_MOD_DELETETEXT):
+            return
+
+        # the state is out of sync if the editor was changed before the manager was in sync, so read everything
+        if len(self.previous_state) != self.editor.lines() - lines_added:
+            self.on_lines_changed()
+            return
+
+        first_line = self.editor.SendScintilla(QsciScintilla.SCI_LINEFROMPOSITION, position)
+        old_count = 1 + max(0, -lines_added)
+        new_count = 1 + max(0, lines_added)
+        self.replace_lines(first_line, old_count, [self._line(i) for i in range(first_line, first_line + new_count)])
 
     @pyqtSlot()
     def on_lines_changed(self):
-        """ updates the counter for all changes in the editor """
-        
-        new_content = [self.editor.text(i).rstrip('\n').strip() for i in range(self.editor.lines())]
-        diff = list(difflib.ndiff(self.previous_state, new_content))
-        
-        added_lines = [l.lstrip('+ ') for l in diff if l.startswith('+ ')]
-        removed_lines = [l.lstrip('- ') for l in diff if l.startswith('- ')]
-        
-        for line in removed_lines:
-            self.line_counter.delete(line)
-        for line in added_lines:
-            self.line_counter.insert(line)
-
-        self.previous_state = new_content
+        """ re-reads all lines in the editor and updates the counter with the difference """
+        self.set_lines([self.editor.text(i) for i in range(self.editor.lines())])
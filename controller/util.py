@@ -1,17 +1,21 @@
 import re
+import time
+from contextlib import contextmanager
 from PyQt6.QtCore import QThread, pyqtSignal
 
 
 class SolverThread(QThread):
     update_signal = pyqtSignal(str)
 
-    def __init__(self, solver, *args, **kwargs):
+    def __init__(self, solver, *args, plan=None, resume=False, **kwargs):
         super().__init__(*args, **kwargs)
         self.solver = solver
+        self.plan = plan
+        self.resume = resume
 
     def run(self):
         # Call the solver's solve method.
-        self.solver.solve()
+        self.solver.solve(resume=self.resume, plan=self.plan)
 
 
 def clean_text(text):
@@ -21,3 +25,33 @@ def clean_text(text):
     text = text.replace(' ', '')
     text = text.replace('\n', '')
     return text
+
+
+class StartupReport:
+    """
+    records the time spent importing and constructing each subsystem at startup
+    measures can be nested, nested measures are indented and included in the time of the parent
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.entries = []
+        self.depth = 0
+
+    @contextmanager
+    def measure(self, name: str):
+        entry = [name, self.depth, 0.0]
+        self.entries.append(entry)
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry[2] = time.perf_counter() - start
+            self.depth -= 1
+
+    def report(self) -> str:
+        total = time.perf_counter() - self.start
+        lines = [f"{'  ' * depth}{name:<{40 - 2 * depth}} {seconds * 1000:8.1f} ms" for name, depth, seconds in self.entries]
+        lines.append(f"{'total since start':<40} {total * 1000:8.1f} ms")
+        return '\n'.join(lines)
@@ -1,13 +1,16 @@
 import ast
-import networkx as nx
 from ast import AST
-from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
-from pint import UnitRegistry
-from eqsys.util import Counter, GridManager
-from eqsys.objects import Factory
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+from eqsys.observer import Signal
+from eqsys.util import Counter, GridManager, ChangeSet, SymbolTable
+from eqsys.objects import Factory, Equation, Parameter, VariableStore
 
+if TYPE_CHECKING:
+    from pint import UnitRegistry
 
-class EquationManager(QObject):
+
+class EquationManager:
     """
     object hiearchy (objects will be created in this order):
         namespace
@@ -16,7 +19,6 @@ class EquationManager(QObject):
     """
 
     def __init__(self):
-        super().__init__()
         self.namespace = {}
 
         self.factory = Factory()
@@ -37,29 +39,53 @@ class EquationManager(QObject):
         # added from counters when new counter is created
         self.variables = {}
         self.functions = {}
+
+        # starting guesses, bounds and units of the variables, the variables are views over it
+        self.variable_store = VariableStore()
+
+        # integer ids of the object names, equations hold the ids of their objects
+        self.symbols = SymbolTable()
+        self.variable_symbols = set()
+
+        # changes since the last commit from the equation system
+        self.changes = ChangeSet()
         
-    @pyqtSlot(str)
     def _add_variable(self, variable_name):
         """ call factory to create a normal variable if name not in namespace and parameters """
         if variable_name not in (self.namespace or self.parameters):
-            self.variables[variable_name] = self.factory.create_variable(variable_name)
+            if variable_name not in self.variables:
+                self.changes.add('variables', variable_name)
+                variable = self.factory.create_variable(variable_name)
+                variable.attach(self.variable_store)
+                self.variables[variable_name] = variable
+                self.variable_symbols.add(self.symbols.intern(variable_name))
 
-    @pyqtSlot(str)
     def _add_function(self, function_name):
         """ call factory to create a function and add to functions, functions require no check since they are not part of the hiearchy """
+        if function_name not in self.functions:
+            self.changes.add('functions', function_name)
         self.functions[function_name] = self.factory.create_function(function_name)
 
-    @pyqtSlot(str)
     def _remove_variable(self, variable_name):
         """ if name in variables remove it. can potentially be an object in the namespace or a parameter """
         if variable_name in self.variables:
-            del self.variables[variable_name]
+            self.variables.pop(variable_name).detach()
+            self.variable_symbols.discard(self.symbols.ids[variable_name])
+            self.changes.remove('variables', variable_name)
 
-    @pyqtSlot(str)
     def _remove_function(self, function_name):
         """ removes a function from functions. Technically the if exists should not be necessary """
         if function_name in self.functions:
             del self.functions[function_name]
+            self.changes.remove('functions', function_name)
+
+    def hold_counters(self):
+        self.object_counter.hold()
+        self.function_counter.hold()
+
+    def release_counters(self):
+        self.object_counter.release()
+        self.function_counter.release()
 
     def sync_variables(self):
         # all potential variables
@@ -116,20 +142,37 @@ class EquationManager(QObject):
         # if attribute_name == 'unit':
         #     self.unit_updated.emit(variable_name)
 
+    def variable_ids(self, variable_names) -> list[int]:
+        """ the ids of the variables in the variable store """
+        return [self.variables[variable_name].id for variable_name in variable_names]
+
+    def set_starting_guesses(self, variable_names, values) -> None:
+        """ sets the starting guesses of many variables at once """
+        self.variable_store.view('x0')[self.variable_ids(variable_names)] = values
 
-class EquationSystem(QObject):
-    data_changed = pyqtSignal()
-    equation_error = pyqtSignal()
-    equation_warning = pyqtSignal()
-    equation_system_error = pyqtSignal()
 
-    def __init__(self, ureg: UnitRegistry):
-        super().__init__()
-        # unit registry
-        self.ureg = ureg
+class EquationSystem:
+    """
+    Every insert/delete emits data_changed, unless it happens inside a batch:
+        with eqsys.batch():
+            eqsys.insert_equation(...)
+    in which case syncing, counter signals and data_changed are deferred until the batch is committed
+    changes_committed carries the consolidated ChangeSet and is emitted right before data_changed
+    """
+    data_changed = Signal()
+    changes_committed = Signal()
+    equation_error = Signal()
+    equation_warning = Signal()
+    equation_system_error = Signal()
+
+    def __init__(self, ureg: 'UnitRegistry' = None):
+        # unit registry, created on first use if not given since pint is slow to import
+        self._ureg = ureg
 
         # name space for functions, objects, constants, parameters
         self._namespace = {}
+        # python source the namespace was executed from, if known, so a copy (e.g. a pickled plan) can execute it again
+        self.namespace_source = None
 
         # manages equations and objects in the equations
         self.eq_manager = EquationManager()
@@ -142,21 +185,76 @@ class EquationSystem(QObject):
         self.variables = self.eq_manager.variables
         self.parameters = self.eq_manager.parameters
         self.functions = self.eq_manager.functions
+
+        # batch depth and whether a sync was requested during the batch
+        self._batch_depth = 0
+        self._sync_pending = False
     
+    def __getstate__(self):
+        # the unit registry cannot be pickled, a copy (e.g. in a worker process) creates its own on first use
+        state = self.__dict__.copy()
+        state['_ureg'] = None
+        return state
+
+    @property
+    def ureg(self) -> 'UnitRegistry':
+        if self._ureg is None:
+            import pint
+            self._ureg = pint.UnitRegistry()
+        return self._ureg
+
+    @ureg.setter
+    def ureg(self, value: 'UnitRegistry') -> None:
+        self._ureg = value
+
     @property
     def namespace(self):
         return self._namespace
 
     @namespace.setter
     def namespace(self, value: dict) -> None:
+        """ set namespace_source after the namespace, a new namespace clears it """
         # todo: insert one item at a time?
+        self.namespace_source = None
         self._namespace.clear()
         self._namespace.update(value)
         self.eq_manager.namespace.clear()
         self.eq_manager.namespace.update(value)
-        self._sync()
+        self._request_sync()
+        self._on_change()
+
+    @contextmanager
+    def batch(self):
+        """ defers syncing and signals until the outermost batch exits """
+        self.begin_batch()
+        try:
+            yield self.eq_manager.changes
+        finally:
+            self.end_batch()
+
+    def begin_batch(self) -> None:
+        self._batch_depth += 1
+        if self._batch_depth == 1:
+            self.eq_manager.hold_counters()
+
+    def end_batch(self) -> None:
+        self._batch_depth -= 1
+        if self._batch_depth:
+            return
+
+        # counters emit the net names added/removed, which updates variables and functions
+        self.eq_manager.release_counters()
+        if self._sync_pending:
+            self._sync_pending = False
+            self._sync()
         self._on_change()
 
+    def _request_sync(self):
+        if self._batch_depth:
+            self._sync_pending = True
+        else:
+            self._sync()
+
     def _sync(self):
         """ we need to sync various stuff when updating parameters and namespace """
         self.eq_manager.sync_variables()
@@ -170,70 +268,104 @@ class EquationSystem(QObject):
                 self.grid.assign(parameter_name, values)
         
     def _on_change(self):
-        """ emits data_updated signal, validates eqsys and validate the list of eqs or all eqs if validate_all"""
+        """ emits the changes and the data_updated signal, unless we are in a batch """
+        if self._batch_depth:
+            return
+        changes, self.eq_manager.changes = self.eq_manager.changes, ChangeSet()
+        self.changes_committed.emit(changes)
         self.data_changed.emit()
         
     def insert_equation(self, equation: str, equation_tree: ast.Expression) -> None:
         """ an equation on the form lhs=rhs, the AST for that string"""
-        equation_object = self.eq_manager.factory.create_equation(equation, equation_tree)
-        self.eq_manager.equations[equation] = equation_object
-        self.eq_manager.increase_counters(equation_object.objects, equation_object.functions)
-        self._on_change()
+        self.add_equation(self.eq_manager.factory.create_equation(equation, equation_tree))
 
     def insert_parameter(self, parameter_name: str, parameter_tree: ast.Assign) -> None:
         """ name of the parameter and the AST for value of the parameter: param=value """
-        parameter = self.eq_manager.factory.create_parameter(parameter_name, parameter_tree)
-        self.eq_manager.parameters[parameter_name] = parameter
+        self.add_parameter(self.eq_manager.factory.create_parameter(parameter_name, parameter_tree))
+
+    def add_equation(self, equation_object: Equation) -> None:
+        """ an equation which is already compiled, e.g. by the lines manager """
+        equation_object.object_ids = self.eq_manager.symbols.intern_all(equation_object.objects)
+        self.eq_manager.equations[equation_object.equation] = equation_object
+        self.eq_manager.changes.add('equations', equation_object.equation)
+        self.eq_manager.increase_counters(equation_object.objects, equation_object.functions)
+        self._on_change()
+
+    def add_parameter(self, parameter: Parameter) -> None:
+        """ a parameter which is already compiled, e.g. by the lines manager """
+        self.eq_manager.parameters[parameter.name] = parameter
+        self.eq_manager.changes.add('parameters', parameter.name)
         self.eq_manager.increase_counters(parameter.objects, parameter.functions)
-        self._sync()
+        self._request_sync()
         self._on_change()
 
     def delete_equation(self, name: str) -> None:
         object_names, function_names = self.eq_manager.equations[name].objects, self.eq_manager.equations[name].functions
         self.eq_manager.decrease_counters(object_names, function_names)
         del self.equations[name]
+        self.eq_manager.changes.remove('equations', name)
         self._on_change()
 
     def delete_parameter(self, name: str) -> None:
         object_names, function_names = self.eq_manager.parameters[name].objects, self.eq_manager.parameters[name].functions
         self.eq_manager.decrease_counters(object_names, function_names)
         del self.eq_manager.parameters[name]
-        self._sync()
+        self.eq_manager.changes.remove('parameters', name)
+        self._request_sync()
         self._on_change()
         
     def blocking(self, return_graph=False):
-        # Get eqs
-        eqs = [eq for eq in self.equations.values()]
+        """ the blocks as sets of equation names, in the order they are solved """
+        equations, blocks, graph = self.block_indices()
+        names = [equation.equation for equation in equations]
+        sccs = [{names[i] for i in block} for block in blocks]
+
+        if return_graph:
+            import networkx as nx
+            return sccs, nx.relabel_nodes(graph, dict(enumerate(names)))
+        else:
+            return sccs
+
+    def block_indices(self):
+        """
+        the equations, the blocks as sorted positions in equations and the directed graph of the positions
+        nodes are integers: equations by position, variables by their symbol id as -1 - id
+        equation nodes hold the symbol id of the variable matched to them as attribute variable, unless unmatched
+        """
+        # imported here, so importing the equation system does not import networkx
+        import networkx as nx
+
+        equations = list(self.equations.values())
 
-        # Get nodes
-        eq_nodes = [eq.equation for eq in eqs]
-        var_nodes = list(self.variables.keys())
+        # symbol ids of the variables in each equation, and the equations of each variable
+        variable_symbols = self.eq_manager.variable_symbols
+        equation_variables = [[symbol for symbol in equation.object_ids if symbol in variable_symbols] for equation in equations]
+        variable_equations = {}
+        for i, variables in enumerate(equation_variables):
+            for variable in variables:
+                variable_equations.setdefault(variable, []).append(i)
+
+        eq_nodes = range(len(equations))
 
         # Bipartite graph
         B = nx.Graph()
         B.add_nodes_from(eq_nodes, bipartite=0)
-        B.add_nodes_from(var_nodes, bipartite=1)
-        B.add_edges_from([(eq.equation, var) for eq in eqs for var in eq.objects if var in self.variables])
+        B.add_nodes_from((-1 - variable for variable in self.eq_manager.variable_symbols), bipartite=1)
+        B.add_edges_from((i, -1 - variable) for i, variables in enumerate(equation_variables) for variable in variables)
 
-        # Matching; associate one variable with one equation
-        matching = nx.algorithms.bipartite.hopcroft_karp_matching(B, top_nodes=eq_nodes)  # todo: contains both ways, remove one
+        # Matching; associate one variable with one equation, the matching contains both ways
+        matching = nx.algorithms.bipartite.hopcroft_karp_matching(B, top_nodes=eq_nodes)
 
-        # Directed graph
+        # Directed graph, from the equation matched to a variable to the other equations of the variable
         DG = nx.DiGraph()
         DG.add_nodes_from(eq_nodes)
 
         for eq, var in matching.items():
-            shared_equations = [eq.equation for eq in self.equations.values() if var in eq.objects]
-            for shared_eq in shared_equations:
-                DG.add_edge(eq, shared_eq)
-
-        # Remove self loops
-        DG.remove_edges_from(nx.selfloop_edges(DG))
+            if eq >= 0:
+                DG.nodes[eq]['variable'] = -1 - var
+                DG.add_edges_from((eq, shared_eq) for shared_eq in variable_equations[-1 - var] if shared_eq != eq)
 
-        sccs = list(nx.strongly_connected_components(DG))
+        sccs = [sorted(scc) for scc in nx.strongly_connected_components(DG)]
         sccs.reverse()
 
-        if return_graph:
-            return sccs, DG
-        else:    
-            return sccs
+        return equations, sccs, DG
@@ -0,0 +1,227 @@
+import ast
+from collections import defaultdict
+from collections import Counter as Multiset
+from eqsys.observer import Signal
+from eqsys.util import Counter, CompileCache
+from eqsys.objects import Factory, Equation
+
+
+class ParsedLine:
+    """
+    A line which parsed to an equation or a parameter
+    name is the unparsed line, obj is the compiled Equation or Parameter
+    """
+    __slots__ = ('name', 'kind', 'obj')
+
+    def __init__(self, name: str, kind: str, obj):
+        self.name = name
+        self.kind = kind
+        self.obj = obj
+
+    def __repr__(self):
+        return f"ParsedLine(name={self.name}, kind={self.kind}, obj={self.obj!r})"
+
+
+class LineParser:
+    """
+    parses and compiles a single line, has its own factory so it can be used from a worker thread
+    lines seen before are taken from the compile cache without parsing
+    in compact mode the trees are not kept after compiling
+    """
+
+    def __init__(self, compile_cache: CompileCache = None, compact=False):
+        self.factory = Factory(compile_cache=compile_cache, compact=compact)
+        self.compile_cache = self.factory.compile_cache
+
+    def parse(self, line: str) -> ParsedLine | None:
+        """ returns None if the line is not an equation or a parameter """
+        key = self.compile_cache.key_of(line)
+        if key is not None:
+            obj = self.factory.create_from_cache(key)
+            if obj is not None:
+                kind = 'equation' if isinstance(obj, Equation) else 'parameter'
+                return ParsedLine(key, kind, obj)
+
+        parsed_line = self._parse(line)
+        if parsed_line is not None:
+            self.compile_cache.set_key(line, parsed_line.name)
+        return parsed_line
+
+    def _parse(self, line: str) -> ParsedLine | None:
+        try:
+            # todo: issue with empty and isistance check
+            tree = ast.parse(line, mode='exec')
+            statement = tree.body[0]
+
+            # Comparison
+            if isinstance(statement.value, ast.Compare):
+                name = ast.unparse(tree)
+                equation = self.factory.create_equation(name, ast.Expression(statement.value))
+                return ParsedLine(name, 'equation', equation)
+
+            # Assignment
+            elif isinstance(statement, ast.Assign):
+                name = ast.unparse(tree)
+                parameter_name = ast.unparse(statement.targets[0])
+                parameter = self.factory.create_parameter(parameter_name, statement, key=name)
+                return ParsedLine(name, 'parameter', parameter)
+
+        except (SyntaxError, IndexError, AttributeError):
+            # empty lines and statements without a value are skipped as well
+            pass
+        return None
+
+
+class LinesManager:
+    """
+    keeps a count of unique lines
+    keeps a count to unique parsed lines
+    emits signals on eq/param added/removed
+    lines are given with set_lines (e.g. from a file) or replace_lines (an edit)
+
+    unique lines which are added or removed are collected and applied in one update,
+    emits update_started/update_finished around every update
+    here lines are parsed and applied right away, controller.lines.EditorLinesManager parses them in a worker thread
+    """
+    add_equation = Signal()
+    remove_equation = Signal()
+    add_parameter = Signal()
+    remove_parameter = Signal()
+    update_started = Signal()
+    update_finished = Signal()
+
+    def __init__(self, compile_cache: CompileCache = None, compact=False, **kwargs):
+        # cooperative, so the editor lines manager can also be a QObject
+        super().__init__(**kwargs)
+
+        # unique lines added (True) or removed (False) since the last update
+        self.pending = {}
+
+        self.parser = LineParser(compile_cache, compact)
+        self.compile_cache = self.parser.compile_cache
+
+        self.previous_state = []
+
+        # keeps a count of unique lines in the editor
+        # signals when a name is added or removed from the count
+        # key name is the line str
+        self.line_counter = Counter()
+        self.line_counter.name_added.connect(self.unique_line_added)
+        self.line_counter.name_removed.connect(self.unique_line_removed)
+
+        # keeps a count of unique parsed lines
+        # key name is the unparsed line
+        self.parsed_line_counter = Counter()
+        self.parsed_line_counter.name_added.connect(self.unique_parsed_line_added)
+        self.parsed_line_counter.name_removed.connect(self.unique_parsed_line_removed)
+
+        # map from unique lines to parsed lines
+        # multiple lines could result in the same line; a =1, a=1
+        self.map_line_to_parsed = defaultdict(str)
+
+    def unique_parsed_line_added(self, name):
+        """ when a unique parsed line is added to the parsed_line_counter """
+        parsed_line = self.parsed_line_counter.get_object(name)
+
+        if parsed_line.kind == 'equation':
+            self.add_equation.emit(parsed_line.obj)
+        elif parsed_line.kind == 'parameter':
+            self.add_parameter.emit(parsed_line.obj)
+
+    def unique_parsed_line_removed(self, name):
+        """ when a unique parsed line is removed from the parsed_line_counter """
+        parsed_line = self.parsed_line_counter.get_object(name)
+
+        if parsed_line.kind == 'equation':
+            self.remove_equation.emit(name)
+        elif parsed_line.kind == 'parameter':
+            self.remove_parameter.emit(parsed_line.obj.name)
+
+    def unique_line_added(self, name):
+        """ new unique line added, it is parsed on the next update """
+        if self.pending.get(name) is False:
+            # removed and added back before the update
+            del self.pending[name]
+        else:
+            self.pending[name] = True
+
+    def unique_line_removed(self, name):
+        """ line removed, it is removed from the parsed lines on the next update """
+        if self.pending.get(name) is True:
+            # added and removed again before the update
+            del self.pending[name]
+        else:
+            self.pending[name] = False
+
+    def schedule(self):
+        """ called after the lines changed, updates right away """
+        self.flush()
+
+    def flush(self):
+        """ parses the pending lines and applies them """
+        if not self.pending:
+            return
+        update, self.pending = self.pending, {}
+        lines = [line for line, added in update.items() if added]
+        self.apply(update, {line: self.parser.parse(line) for line in lines})
+
+    def apply(self, update: dict, results: dict):
+        """
+        applies an update to the parsed lines, removals first so a parameter given a new value is not deleted
+        after its new line is added, a removed line which parses to an added line is removed last,
+        so it is not removed and re-added
+        """
+        self.update_started.emit()
+        added = {line: results[line] for line, is_added in update.items() if is_added and results.get(line) is not None}
+        added_names = {parsed_line.name for parsed_line in added.values()}
+        held = []
+        for line, is_added in update.items():
+            if not is_added and line in self.map_line_to_parsed:
+                name = self.map_line_to_parsed.pop(line)
+                if name in added_names:
+                    held.append(name)
+                else:
+                    self.parsed_line_counter.delete(name)
+        for line, parsed_line in added.items():
+            # increase counter and associate the parsed line with the unparsed line
+            self.parsed_line_counter.insert(parsed_line.name, parsed_line)
+            self.map_line_to_parsed[line] = parsed_line.name
+        for name in held:
+            self.parsed_line_counter.delete(name)
+        self.update_finished.emit()
+
+    def replace_lines(self, start: int, count: int, new_lines: list[str]):
+        """ replaces count lines from start with new_lines and updates the counter with the lines which differ """
+        old_lines = self.previous_state[start:start + count]
+        self.previous_state[start:start + count] = new_lines
+
+        # lines present both before and after (moved or unchanged) do not touch the counter
+        old_count, new_count = Multiset(old_lines), Multiset(new_lines)
+        removed_lines = old_count - new_count
+        added_lines = new_count - old_count
+
+        for line, n in removed_lines.items():
+            for _ in range(n):
+                self.line_counter.delete(line)
+        for line, n in added_lines.items():
+            for _ in range(n):
+                self.line_counter.insert(line)
+        if self.pending:
+            self.schedule()
+
+    def set_lines(self, lines: list[str]):
+        """ replaces all lines and updates the counter with the difference """
+        self.replace_lines(0, len(self.previous_state), [line.rstrip('\n').strip() for line in lines])
+
+
+def connect_lines_manager(lines_manager: LinesManager, equation_system) -> None:
+    """ applies the lines of the lines manager to the equation system """
+    lines_manager.add_equation.connect(equation_system.add_equation)
+    lines_manager.remove_equation.connect(equation_system.delete_equation)
+
+    lines_manager.add_parameter.connect(equation_system.add_parameter)
+    lines_manager.remove_parameter.connect(equation_system.delete_parameter)
+
+    # bulk updates (load, paste, undo) are applied to the equation system as one batch
+    lines_manager.update_started.connect(equation_system.begin_batch)
+    lines_manager.update_finished.connect(equation_system.end_batch)
@@ -1,42 +1,70 @@
 import ast
-import numpy as np
+import math
+import marshal
+from array import array
 from types import CodeType
-from PyQt6.QtCore import QObject
 from ast import AST
-from pint import Unit
-from eqsys.util import LRUCache, NameCollector, CreateResidual
+from typing import TYPE_CHECKING
+from eqsys.util import LRUCache, NameCollector, CreateResidual, CompileCache, CompiledLine
+
+if TYPE_CHECKING:
+    from pint import Unit
 
 
 class Equation:
     """
     Equation is lhs=rhs, residual is lhs-rhs
     Residual tree is used for unit validation, residual code is used in the residual function 
+    if the residual tree is not kept (compact mode) it is parsed again from the equation when asked for
     """
+    __slots__ = ('equation', '_tree', 'residual', 'objects', 'functions', 'object_ids')
+
     def __init__(self,  
                  equation: str,
-                 residual_tree: AST,
+                 residual_tree: AST | None,
                  residual_code: CodeType,
                  object_names: set[str],
                  function_names: set[str]):
         
         self.equation = equation
-        self.tree = residual_tree,
+        self._tree = residual_tree
         self.residual = residual_code
 
         self.objects = object_names
         self.functions = function_names
 
+        # symbol ids of the objects, set by the equation system which holds the equation
+        self.object_ids = None
+
     def __repr__(self):
         return f"Equation(name={self.equation}, tree=residual_tree, residual=code, objects={self.objects}, functions={self.functions})"
 
+    def __getstate__(self):
+        # code objects cannot be pickled
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state['residual'] = marshal.dumps(self.residual)
+        return state
+
+    def __setstate__(self, state):
+        state['residual'] = marshal.loads(state['residual'])
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def __str__(self):
         return f"{self.equation}"
 
+    @property
+    def tree(self) -> AST:
+        if self._tree is not None:
+            return self._tree
+        return CreateResidual().visit(ast.parse(self.equation, mode='eval'))
+
 
 class Parameter:
     """
     # todo: make a system for setting type
-    tree is for the complete assignment
+    tree is for the complete assignment, source is the normalized line
+    if the tree is not kept (compact mode) it is parsed again from the source when asked for
     name is lhs of assignment
     value is the compiled rhs of the assignment
     object names contains the name of the parameter
@@ -45,17 +73,20 @@ class Parameter:
         string
         or a list of any of those
     """
+    __slots__ = ('name', 'source', '_tree', 'code', 'objects', 'functions', 'unit', '_grid')
 
     def __init__(self, 
                  name: str,
-                 tree: AST,
+                 tree: AST | None,
                  value_code: CodeType,
                  object_names: set[str], 
                  function_names: set[str],
-                 unit: Unit = None):
+                 unit: 'Unit' = None,
+                 source: str = None):
         
         self.name = name
-        self.tree = tree
+        self.source = source if source is not None else ast.unparse(tree)
+        self._tree = tree
         self.code = value_code
         self.objects = object_names
         self.functions = function_names
@@ -69,6 +100,23 @@ class Parameter:
     
     def __str__(self):
         return f"{self.name}"
+
+    def __getstate__(self):
+        # code objects cannot be pickled
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state['code'] = marshal.dumps(self.code)
+        return state
+
+    def __setstate__(self, state):
+        state['code'] = marshal.loads(state['code'])
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @property
+    def tree(self) -> ast.Assign:
+        if self._tree is not None:
+            return self._tree
+        return ast.parse(self.source).body[0]
     
     @property
     def grid(self):
@@ -79,19 +127,87 @@ class Parameter:
         self._grid = status
 
 
+class VariableStore:
+    """
+    starting guesses, bounds and unit ids of the variables in contiguous arrays, indexed by the id of the variable
+    the arrays are array.array, so the equation system does not need numpy until a solve, view gives them as numpy arrays
+    units are interned in units, unit id -1 is no unit
+    ids of removed variables are reused
+    """
+
+    def __init__(self, capacity=64):
+        self.x0 = array('d', [1.0]) * capacity
+        self.lower_bounds = array('d', [-math.inf]) * capacity
+        self.upper_bounds = array('d', [math.inf]) * capacity
+        self.unit_ids = array('i', [-1]) * capacity
+
+        self.units = []
+        self._unit_index = {}
+
+        # ids below size have been handed out, free holds those which were released
+        self.size = 0
+        self._free = []
+
+    def __len__(self):
+        return self.size - len(self._free)
+
+    def allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if self.size == len(self.x0):
+            self._grow(2 * self.size)
+        self.size += 1
+        return self.size - 1
+
+    def release(self, variable_id: int) -> None:
+        self._free.append(variable_id)
+
+    def _grow(self, capacity: int) -> None:
+        for attribute, fill in (('x0', 1.0), ('lower_bounds', -math.inf), ('upper_bounds', math.inf), ('unit_ids', -1)):
+            values = getattr(self, attribute)
+            values.extend(array(values.typecode, [fill]) * (capacity - len(values)))
+
+    def view(self, attribute: str):
+        """
+        the array of attribute as a numpy array sharing its memory, e.g. for fancy indexing
+        do not keep the view, the store cannot grow while it exists
+        """
+        import numpy as np
+        values = getattr(self, attribute)
+        return np.frombuffer(values, dtype=np.dtype(values.typecode))
+
+    def unit_id(self, unit: 'Unit | None') -> int:
+        if unit is None:
+            return -1
+        if unit not in self._unit_index:
+            self._unit_index[unit] = len(self.units)
+            self.units.append(unit)
+        return self._unit_index[unit]
+
+    def unit(self, unit_id: int) -> 'Unit | None':
+        return self.units[unit_id] if unit_id >= 0 else None
+
+
 class Variable:
+    """
+    view over its row in a variable store, while it is not in a store (e.g. removed and kept in the factory cache)
+    the variable holds its attributes itself
+    """
+    __slots__ = ('_name', '_store', '_id', '_values')
+    _attributes = {'starting_guess': 'x0', 'lower_bound': 'lower_bounds', 'upper_bound': 'upper_bounds'}
+
     def __init__(self, 
                  name: str,
-                 starting_guess: int | float | complex = 1,
-                 lower_bound: int | float | complex = -np.inf,
-                 upper_bound: int | float | complex = np.inf,
-                 unit: Unit = None):
+                 starting_guess: int | float = 1,
+                 lower_bound: int | float = -math.inf,
+                 upper_bound: int | float = math.inf,
+                 unit: 'Unit' = None):
 
         self._name = name
-        self.starting_guess = starting_guess
-        self.lower_bound = lower_bound
-        self.upper_bound = upper_bound
-        self.unit = unit
+        self._store = None
+        self._id = None
+        self._values = {'starting_guess': starting_guess, 'lower_bound': lower_bound, 'upper_bound': upper_bound,
+                        'unit': unit}
 
     def __repr__(self) -> str:
         return f'Variable(name={self._name}, x0={self.starting_guess}, lb={self.lower_bound}, ub={self.upper_bound}, unit={self.unit})'
@@ -103,11 +219,87 @@ class Variable:
     def name(self) -> str:
         return self._name
 
+    @property
+    def id(self) -> int | None:
+        """ the index in the store, None if not in a store """
+        return self._id
+
+    def attach(self, store: VariableStore) -> None:
+        """ moves the attributes into a row of the store """
+        if self._store is store:
+            return
+        if self._store is not None:
+            self.detach()
+        self._id = store.allocate()
+        self._store = store
+        for name, value in self._values.items():
+            setattr(self, name, value)
+        self._values = None
+
+    def detach(self) -> None:
+        """ takes the attributes out of the store and releases the row """
+        if self._store is None:
+            return
+        self._values = {name: getattr(self, name) for name in ('starting_guess', 'lower_bound', 'upper_bound', 'unit')}
+        self._store.release(self._id)
+        self._store = None
+        self._id = None
+
+    def _get(self, name):
+        if self._store is None:
+            return self._values[name]
+        return float(getattr(self._store, self._attributes[name])[self._id])
+
+    def _set(self, name, value):
+        if self._store is None:
+            self._values[name] = value
+        else:
+            getattr(self._store, self._attributes[name])[self._id] = value
+
+    @property
+    def starting_guess(self) -> float:
+        return self._get('starting_guess')
+
+    @starting_guess.setter
+    def starting_guess(self, value: float):
+        self._set('starting_guess', value)
+
+    @property
+    def lower_bound(self) -> float:
+        return self._get('lower_bound')
+
+    @lower_bound.setter
+    def lower_bound(self, value: float):
+        self._set('lower_bound', value)
+
+    @property
+    def upper_bound(self) -> float:
+        return self._get('upper_bound')
+
+    @upper_bound.setter
+    def upper_bound(self, value: float):
+        self._set('upper_bound', value)
+
+    @property
+    def unit(self) -> 'Unit | None':
+        if self._store is None:
+            return self._values['unit']
+        return self._store.unit(self._store.unit_ids[self._id])
+
+    @unit.setter
+    def unit(self, unit: 'Unit | None'):
+        if self._store is None:
+            self._values['unit'] = unit
+        else:
+            self._store.unit_ids[self._id] = self._store.unit_id(unit)
+
 
 class Function:
+    __slots__ = ('name', 'unit')
+
     def __init__(self, 
                  name: str, 
-                 unit: Unit = None):
+                 unit: 'Unit' = None):
         
         self.name = name
         self.unit = unit
@@ -119,35 +311,76 @@ class Function:
         return f"{self.name}"
 
 
-class Factory(QObject):
+class Factory:
     """ 
     Returns the object specified: equations, parameters, variables, functions
     Keeps a cache for objects which can be modified: parameters, variables, functions
+    Keeps a compile cache for equations and parameters, keyed by the normalized line
+    In compact mode trees are dropped after compiling, equations and parameters parse them again when asked for
     """
 
-    def __init__(self, cache_size=1000):
-        super().__init__()
+    def __init__(self, cache_size=1000, compile_cache: CompileCache = None, compact=False):
+        self.compact = compact
         self.parameter_cache = LRUCache(cache_size)
         self.variable_cache = LRUCache(cache_size)
         self.function_cache = LRUCache(cache_size)
+        self.compile_cache = compile_cache if compile_cache is not None else CompileCache()
 
         self.collector = NameCollector()
         self.residual_transformer = CreateResidual()
 
+    def __getstate__(self):
+        # the compile cache is shared with the lines manager, a copy starts with an empty one
+        state = self.__dict__.copy()
+        del state['compile_cache']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.compile_cache = CompileCache()
+
     def create_equation(self, equation: str, equation_tree: ast.Expression) -> Equation:
-        object_names, func_names = self.collector.get_names(equation_tree)
-        residual_tree = self.residual_transformer.visit(equation_tree)
-        residual_code = compile(residual_tree, filename='<string>', mode='eval')
-        return Equation(equation, residual_tree, residual_code, object_names, func_names)
+        """ equation is the normalized line, used as key in the compile cache """
+        compiled_line = self.compile_cache.get(equation)
+        if compiled_line is None:
+            object_names, func_names = self.collector.get_names(equation_tree)
+            residual_tree = self.residual_transformer.visit(equation_tree)
+            residual_code = compile(residual_tree, filename='<string>', mode='eval')
+            compiled_line = CompiledLine('equation', None if self.compact else residual_tree, residual_code, frozenset(object_names), frozenset(func_names))
+            self.compile_cache.put(equation, compiled_line)
+        return self._equation_from(equation, compiled_line)
 
-    def create_parameter(self, parameter_name: str, parameter_tree: ast.Assign) -> Parameter:
-        object_names, func_names = self.collector.get_names(parameter_tree)
-        
-        # extract the assignment value
-        rhs = ast.Expression(parameter_tree.value)
-        compiled_rhs = compile(rhs, filename="", mode='eval')
-        
-        return Parameter(parameter_name, parameter_tree, compiled_rhs, object_names, func_names)
+    def create_parameter(self, parameter_name: str, parameter_tree: ast.Assign, key: str = None) -> Parameter:
+        """ key is the normalized line, used as key in the compile cache """
+        key = key or ast.unparse(parameter_tree)
+        compiled_line = self.compile_cache.get(key)
+        if compiled_line is None:
+            object_names, func_names = self.collector.get_names(parameter_tree)
+            
+            # extract the assignment value
+            rhs = ast.Expression(parameter_tree.value)
+            compiled_rhs = compile(rhs, filename="", mode='eval')
+            compiled_line = CompiledLine('parameter', None if self.compact else parameter_tree, compiled_rhs, frozenset(object_names), frozenset(func_names), parameter_name)
+            self.compile_cache.put(key, compiled_line)
+        return self._parameter_from(key, compiled_line)
+
+    def create_from_cache(self, key: str) -> Equation | Parameter | None:
+        """ the equation or parameter for a normalized line, if it is in the compile cache """
+        compiled_line = self.compile_cache.get(key)
+        if compiled_line is None:
+            return None
+        if compiled_line.kind == 'equation':
+            return self._equation_from(key, compiled_line)
+        return self._parameter_from(key, compiled_line)
+
+    def _equation_from(self, equation: str, compiled_line: CompiledLine) -> Equation:
+        tree = None if self.compact else compiled_line.tree
+        return Equation(equation, tree, compiled_line.code, compiled_line.objects, compiled_line.functions)
+
+    def _parameter_from(self, key: str, compiled_line: CompiledLine) -> Parameter:
+        tree = None if self.compact else compiled_line.tree
+        return Parameter(compiled_line.name, tree, compiled_line.code, compiled_line.objects, compiled_line.functions,
+                         source=key)
         
         # todo: we cannot do cache this way, since the objects will change, but the cache object will not
         # return self.parameter_cache.setdefault(name, Parameter(name, tree, compiled_rhs, object_names, func_names))
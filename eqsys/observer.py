@@ -0,0 +1,47 @@
+class Signal:
+    """
+    Pure python signal, so the equation system can be used without Qt (headless, worker processes)
+    Declared on the class like a pyqtSignal:
+        class Counter:
+            name_added = Signal()
+    and used on the instance:
+        counter.name_added.connect(slot)
+        counter.name_added.emit(name)
+    Slots are called directly in the thread which emits, use controller.adapter.QtAdapter to call slots in the gui thread
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        bound_signal = instance.__dict__.get(self.name)
+        if bound_signal is None:
+            bound_signal = instance.__dict__[self.name] = BoundSignal()
+        return bound_signal
+
+
+class BoundSignal:
+    """ the signal of an instance, connections are not pickled """
+    __slots__ = ('slots',)
+
+    def __init__(self):
+        self.slots = []
+
+    def __reduce__(self):
+        return BoundSignal, ()
+
+    def connect(self, slot):
+        self.slots.append(slot)
+
+    def disconnect(self, slot=None):
+        """ disconnects the slot, or all slots if none is given """
+        if slot is None:
+            self.slots.clear()
+        else:
+            self.slots.remove(slot)
+
+    def emit(self, *args):
+        for slot in tuple(self.slots):
+            slot(*args)
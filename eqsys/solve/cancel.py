@@ -0,0 +1,49 @@
+import threading
+
+# failure codes recorded for each row
+FAILURE_NONE = 0
+FAILURE_BLOCK_TIME = 1
+FAILURE_POINT_TIME = 2
+# no method of the fallback chain found a solution of the block
+FAILURE_NOT_CONVERGED = 3
+# every method of the fallback chain raised, e.g. the residuals could not be evaluated
+FAILURE_ERROR = 4
+
+
+class SolveCancelled(Exception):
+    """ raised in the solving thread when the solve is cancelled """
+
+
+class BudgetExceeded(Exception):
+    """ raised in the residual function when the time budget of a block or run is spent, failure is the failure code """
+
+    def __init__(self, failure: int):
+        super().__init__(failure)
+        self.failure = failure
+
+
+class RaceLost(Exception):
+    """ raised in the residual function of a raced method once another method has won the race """
+
+
+class CancellationToken:
+    """
+    cancel is called from any thread, the solve checks the token between runs and blocks and in the residual function
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    def reset(self) -> None:
+        self._event.clear()
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise SolveCancelled()
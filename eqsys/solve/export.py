@@ -0,0 +1,99 @@
+import csv
+import numpy as np
+from eqsys.solve.result import ResultsEntry
+
+# rows formatted at a time when writing csv
+CSV_CHUNK_ROWS = 50000
+
+# file extensions and their exporter
+FORMATS = {
+    '.npz': 'npz',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.csv': 'csv',
+}
+
+
+def entry_columns(entry: ResultsEntry) -> dict[str, np.ndarray]:
+    """
+    the metadata columns (grid index, grid parameters etc) followed by a column for each variable, as views
+    2d metadata (a value per block) is split into a column per index, name[0], name[1], ...
+    """
+    columns = {}
+    for name, column in entry.information.items():
+        if column.ndim == 1:
+            columns[name] = column
+        else:
+            for index in range(column.shape[1]):
+                columns[f'{name}[{index}]'] = column[:, index]
+    data = entry.data
+    for variable, index in entry.columns.items():
+        columns[variable] = data[:, index]
+    return columns
+
+
+def export_entry(entry: ResultsEntry, path: str) -> None:
+    """ writes the entry in the format given by the file extension """
+    extension = path[path.rfind('.'):].lower() if '.' in path else ''
+    if extension not in FORMATS:
+        raise ValueError(f"Unknown export format '{extension}', expected one of {', '.join(FORMATS)}")
+
+    export_format = FORMATS[extension]
+    if export_format == 'npz':
+        export_npz(entry, path)
+    elif export_format == 'parquet':
+        export_parquet(entry, path)
+    elif export_format == 'arrow':
+        export_arrow(entry, path)
+    else:
+        export_csv(entry, path)
+
+
+def export_npz(entry: ResultsEntry, path: str, **arrays) -> None:
+    """
+    data is the results with a column for each name in variables, metadata columns are stored as information_<name>
+    arrays are stored as well
+    """
+    information = {f'information_{name}': _plain(column) for name, column in entry.information.items()}
+    np.savez(path, data=entry.data, variables=np.array(entry.variables), **information, **arrays)
+
+
+def _table(entry: ResultsEntry):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("Exporting to parquet/arrow requires pyarrow (pip install pyarrow)") from None
+    columns = {name: _plain(column) for name, column in entry_columns(entry).items()}
+    return pa.table({name: pa.array(column, from_pandas=column.dtype == object) for name, column in columns.items()})
+
+
+def export_parquet(entry: ResultsEntry, path: str) -> None:
+    table = _table(entry)
+    import pyarrow.parquet as pq
+    pq.write_table(table, path)
+
+
+def export_arrow(entry: ResultsEntry, path: str) -> None:
+    """ arrow ipc file, also known as feather """
+    table = _table(entry)
+    import pyarrow.feather as feather
+    feather.write_feather(table, path)
+
+
+def export_csv(entry: ResultsEntry, path: str, chunk_rows: int = CSV_CHUNK_ROWS) -> None:
+    """ rows are formatted chunk_rows at a time, floats are written with full precision """
+    columns = entry_columns(entry)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns.keys())
+        for start in range(0, len(entry), chunk_rows):
+            chunk = [column[start:start + chunk_rows].tolist() for column in columns.values()]
+            writer.writerows(zip(*chunk))
+
+
+def _plain(column: np.ndarray) -> np.ndarray:
+    """ object columns holding only strings are stored as strings, so they can be loaded without pickle """
+    if column.dtype == object and all(isinstance(value, str) for value in column):
+        return column.astype(str)
+    return column
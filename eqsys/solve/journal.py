@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import struct
+
+
+class Journal:
+    """
+    append-only file of the rows committed during a sweep, so a sweep which failed or was killed can be resumed
+    the file is named by the key of the solve plan
+    the header holds the column names, each record is the grid index followed by the row in the order of the header
+    the order of the variables can differ between processes, so a journal is resumed if it has the same columns
+    in any order, rows are read and appended by column name
+    records are flushed as they are written and synced to disk at most every sync_interval seconds
+    a record which was not completely written (killed while writing) is ignored and overwritten
+    """
+    magic = b'PIES-JOURNAL 1\n'
+
+    def __init__(self, path: str, variables: list[str], resume=False, sync_interval=1.0):
+        self.path = path
+        self.variables = list(variables)
+        self.sync_interval = sync_interval
+        self.record = struct.Struct(f'<q{len(self.variables)}d')
+
+        # rows read from the journal by grid index, in the order of variables
+        self.rows = {}
+        # column names in the file, and the position in a row of variables of each column
+        self.columns = self.variables
+        self._order = None
+
+        if resume and os.path.exists(path):
+            self.file = open(path, 'r+b')
+            columns = self._read_header()
+            if columns is not None and sorted(columns) == sorted(self.variables):
+                self.columns = columns
+                if columns != self.variables:
+                    position = {variable: i for i, variable in enumerate(self.variables)}
+                    self._order = [position[column] for column in columns]
+                self._read(self.file.tell())
+            else:
+                # a journal of another sweep, start over
+                self.file.seek(0)
+                self.file.truncate()
+                self.file.write(self._header())
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.file = open(path, 'w+b')
+            self.file.write(self._header())
+        self.file.flush()
+        self.last_sync = time.monotonic()
+
+    def _header(self) -> bytes:
+        columns = json.dumps(self.columns).encode()
+        return self.magic + struct.pack('<q', len(columns)) + columns
+
+    def _read_header(self) -> list[str] | None:
+        """ the column names of the file, None if it is not a journal """
+        if self.file.read(len(self.magic)) != self.magic:
+            return None
+        size = self.file.read(8)
+        if len(size) != 8:
+            return None
+        try:
+            columns = json.loads(self.file.read(struct.unpack('<q', size)[0]))
+        except ValueError:
+            return None
+        return columns if isinstance(columns, list) else None
+
+    def _read(self, offset: int) -> None:
+        """ reads the complete records and positions the file after the last one """
+        data = self.file.read()
+        complete = len(data) - len(data) % self.record.size
+        for grid_index, *row in self.record.iter_unpack(data[:complete]):
+            if self._order is not None:
+                ordered = [0.0] * len(row)
+                for value, position in zip(row, self._order):
+                    ordered[position] = value
+                row = ordered
+            self.rows[grid_index] = row
+        self.file.seek(offset + complete)
+        self.file.truncate()
+
+    def append(self, grid_index: int, row) -> None:
+        """ row is in the order of variables """
+        if self._order is not None:
+            row = [row[position] for position in self._order]
+        self.file.write(self.record.pack(grid_index, *row))
+        self.file.flush()
+        if time.monotonic() - self.last_sync > self.sync_interval:
+            os.fsync(self.file.fileno())
+            self.last_sync = time.monotonic()
+
+    def close(self) -> None:
+        """ closes the file, the journal is kept so the sweep can be resumed """
+        if not self.file.closed:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+
+    def remove(self) -> None:
+        """ closes and deletes the journal, once the sweep is complete """
+        self.file.close()
+        os.remove(self.path)
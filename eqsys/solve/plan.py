@@ -0,0 +1,259 @@
+import json
+import hashlib
+import importlib
+import itertools
+from types import MappingProxyType, CodeType, ModuleType
+from typing import TYPE_CHECKING
+from eqsys.equationsystem import EquationSystem
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class PlanBlock:
+    """
+    a block of the plan, the residual code of its equations and the variables in the equations
+    incidence holds for each residual the positions in variables of the variables it contains, the sparsity of the jacobian
+    matching pairs each residual with the position of a variable solved by the block, as
+    (residual, variable) in gauss-seidel order: a residual comes after those whose variables it uses, as far as the
+    cycles of the block allow. None if an equation is unmatched
+    """
+    __slots__ = ('equations', 'residuals', 'variables', 'incidence', 'matching')
+
+    def __init__(self, equations: tuple[str, ...], residuals: tuple[CodeType, ...], variables: tuple[str, ...],
+                 incidence: tuple[tuple[int, ...], ...] = None, matching: tuple[tuple[int, int], ...] = None):
+        self.equations = equations
+        self.residuals = residuals
+        self.variables = variables
+        self.incidence = incidence
+        self.matching = matching
+
+    def __repr__(self):
+        return f"PlanBlock(equations={self.equations}, variables={self.variables})"
+
+
+class SolvePlan:
+    """
+    immutable snapshot of everything a solve needs: blocks, compiled residuals, variable starting guesses and bounds,
+    the evaluated namespace and the grid
+    compiled on the thread which edits the equation system, the solver only reads the plan,
+    so the equation system can be edited while solving
+    values in the namespace (functions, modules) are shared with the equation system, the mapping is copied
+    a plan is pickled by its sources, see __reduce__
+    """
+    __slots__ = ('variables', 'index', 'x0', 'lower_bounds', 'upper_bounds', 'blocks', 'namespace',
+                 'grid_names', 'grid_values', 'parameters', 'namespace_source', 'key')
+
+    def __init__(self, variables, x0, lower_bounds, upper_bounds, blocks, namespace, grid_names, grid_values, parameters,
+                 namespace_source: str = None):
+        self.variables = tuple(variables)
+        self.index = MappingProxyType({variable: i for i, variable in enumerate(self.variables)})
+        # read-only arrays indexed like variables, a block takes its values by fancy indexing
+        self.x0 = self._frozen(x0)
+        self.lower_bounds = self._frozen(lower_bounds)
+        self.upper_bounds = self._frozen(upper_bounds)
+        self.blocks = tuple(blocks)
+        self.namespace = MappingProxyType(dict(namespace))
+        self.grid_names = tuple(grid_names)
+        self.grid_values = tuple(tuple(values) for values in grid_values)
+        # unparsed parameters, identifies the plan together with the equations, variables, grid and namespace source
+        self.parameters = tuple(parameters)
+        # python source the namespace was executed from, None if not known
+        self.namespace_source = namespace_source
+        self.key = self._key()
+
+    def __setattr__(self, name, value):
+        if hasattr(self, 'key'):
+            raise AttributeError("SolvePlan is immutable")
+        super().__setattr__(name, value)
+
+    def __reduce__(self):
+        """
+        pickled by its sources, code objects cannot be pickled: the residuals are compiled again from the equations.
+        with a namespace source the namespace is executed again and the parameters evaluated in it, like compile does,
+        else the values of the namespace are pickled, modules by name (functions must then be importable)
+        """
+        blocks = [(block.equations, block.variables, block.incidence, block.matching) for block in self.blocks]
+        values = modules = None
+        if self.namespace_source is None:
+            modules = {name: value.__name__ for name, value in self.namespace.items() if isinstance(value, ModuleType)}
+            values = {name: value for name, value in self.namespace.items() if name not in modules}
+        return _load_plan, (self.variables, self.x0, self.lower_bounds, self.upper_bounds, blocks, values, modules,
+                            self.grid_names, self.grid_values, self.parameters, self.namespace_source)
+
+    @classmethod
+    def compile(cls, equation_system: EquationSystem) -> 'SolvePlan':
+        """ call on the thread which edits the equation system """
+        variables = list(equation_system.variables)
+        store = equation_system.eq_manager.variable_store
+        ids = equation_system.eq_manager.variable_ids(variables)
+        # fancy indexing copies, later edits of the store do not change the plan
+        x0, lower_bounds, upper_bounds = (store.view(attribute)[ids] for attribute in ('x0', 'lower_bounds', 'upper_bounds'))
+
+        symbols = equation_system.eq_manager.symbols
+        variable_symbols = equation_system.eq_manager.variable_symbols
+
+        blocks = []
+        all_equations, block_indices, graph = equation_system.block_indices()
+        for block in block_indices:
+            equations = [all_equations[i] for i in block]
+            block_variables = dict.fromkeys(symbol for equation in equations for symbol in equation.object_ids.tolist()
+                                            if symbol in variable_symbols)
+            positions = {symbol: position for position, symbol in enumerate(block_variables)}
+            incidence = tuple(tuple(dict.fromkeys(positions[symbol] for symbol in equation.object_ids.tolist()
+                                                  if symbol in positions))
+                              for equation in equations)
+            blocks.append(PlanBlock(tuple(equation.equation for equation in equations),
+                                    tuple(equation.residual for equation in equations),
+                                    tuple(symbols.name(symbol) for symbol in block_variables),
+                                    incidence,
+                                    cls._matching(graph, block, equations, incidence, positions, symbols)))
+
+        # sorted by name, so the grid index of a point does not depend on the order the grid was assigned in
+        grid = sorted(equation_system.grid.variables.items())
+        parameters = sorted(parameter.source for parameter in equation_system.parameters.values())
+        return cls(variables, x0, lower_bounds, upper_bounds, blocks, cls._namespace(equation_system),
+                   [name for name, _ in grid], [values for _, values in grid], parameters, equation_system.namespace_source)
+
+    @staticmethod
+    def _matching(graph, block: list[int], equations: list, incidence: tuple, positions: dict, symbols) -> tuple | None:
+        """
+        the (residual, variable) pairs of the block in gauss-seidel order, see PlanBlock
+        a residual is matched to its explicit variable (x == ...) where it is free, then to the variable the blocking
+        matched it to, the rest by augmenting paths. the blocks do not depend on the matching, but substitution
+        converges best for the variable the equation was written for
+        """
+        import networkx as nx
+
+        n = len(block)
+        blocking = [positions.get(graph.nodes[i].get('variable')) for i in block]
+        # the variables solved by the block, the others are solved by the blocks before
+        own = set(blocking)
+        if None in own or len(own) != n:
+            return None
+        incidence = [[variable for variable in variables if variable in own] for variables in incidence]
+        explicit = [positions.get(symbols.ids.get(equation.equation.partition('==')[0].strip())) for equation in equations]
+        explicit = [variable if variable in own else None for variable in explicit]
+        matched = [None] * n
+        # residual matched to each variable
+        owner = {}
+        for preference in (explicit, blocking):
+            for residual, variable in enumerate(preference):
+                if matched[residual] is None and variable is not None and variable not in owner:
+                    matched[residual], owner[variable] = variable, residual
+
+        for residual in range(n):
+            if matched[residual] is not None:
+                continue
+            # breadth first search of an alternating path to a free variable
+            parents, queue, free = {}, [residual], None
+            while queue and free is None:
+                current = queue.pop(0)
+                for variable in incidence[current]:
+                    if variable in parents:
+                        continue
+                    parents[variable] = current
+                    if variable not in owner:
+                        free = variable
+                        break
+                    queue.append(owner[variable])
+            if free is None:
+                return None
+            variable = free
+            while True:
+                current = parents[variable]
+                previous = matched[current]
+                matched[current], owner[variable] = variable, current
+                if current == residual:
+                    break
+                variable = previous
+
+        # from the residual of a variable to the residuals using it, reverse postorder is a topological order where
+        # the block has no cycles
+        order_graph = nx.DiGraph()
+        order_graph.add_nodes_from(range(n))
+        order_graph.add_edges_from((owner[variable], residual) for residual in range(n) for variable in incidence[residual]
+                                   if owner[variable] != residual)
+        order = list(nx.dfs_postorder_nodes(order_graph))
+        order.reverse()
+        return tuple((residual, matched[residual]) for residual in order)
+
+    @staticmethod
+    def _frozen(values) -> 'np.ndarray':
+        import numpy as np
+        array = np.array(values, dtype=float)
+        array.setflags(write=False)
+        return array
+
+    @staticmethod
+    def _namespace(equation_system: EquationSystem) -> dict:
+        # todo bugged since we should build the whole namespace and then exec, parameters could be added
+        namespace = {}
+
+        for name, parameter in equation_system.parameters.items():
+            namespace[name] = eval(parameter.code, equation_system.namespace)
+
+        # namespace window overrides parameters currently
+        namespace.update(equation_system.namespace)
+
+        if '__builtins__' in namespace:
+            del namespace['__builtins__']
+
+        return namespace
+
+    def _key(self) -> str:
+        """
+        identifies the equations, parameters, variables, grid and the source of the namespace, so a sweep is not resumed
+        after a function of the namespace was edited. a namespace without source is not part of the key
+        everything is sorted, the order of the variables follows set iteration and changes with the hash seed
+        """
+        content = {
+            'equations': sorted(equation for block in self.blocks for equation in block.equations),
+            'parameters': sorted(self.parameters),
+            'variables': sorted(self.variables),
+            'grid': repr(sorted(zip(self.grid_names, self.grid_values))),
+        }
+        if self.namespace_source is not None:
+            content['namespace'] = self.namespace_source
+        return hashlib.sha1(json.dumps(content).encode()).hexdigest()
+
+    @property
+    def grid_size(self) -> int:
+        size = 1
+        for values in self.grid_values:
+            size *= len(values)
+        return size
+
+    def grid(self):
+        """ yields the grid points as dicts in order, without building the whole grid """
+        for values in itertools.product(*self.grid_values):
+            yield dict(zip(self.grid_names, values))
+
+
+def _load_plan(variables, x0, lower_bounds, upper_bounds, blocks, values, modules, grid_names, grid_values, parameters,
+               namespace_source) -> SolvePlan:
+    """ rebuilds a pickled plan, see SolvePlan.__reduce__ """
+    # imported here, the lines import the equation system
+    from eqsys.lines import LineParser
+
+    parser = LineParser(compact=True)
+    plan_blocks = [PlanBlock(equations, tuple(parser.parse(equation).obj.residual for equation in equations),
+                             block_variables, incidence, matching)
+                   for equations, block_variables, incidence, matching in blocks]
+
+    if namespace_source is None:
+        namespace = dict(values)
+        namespace.update((name, importlib.import_module(module)) for name, module in modules.items())
+    else:
+        # as SolvePlan._namespace: the parameters are evaluated in the namespace, which overrides them
+        source_namespace = {}
+        exec(compile(namespace_source, '<namespace>', 'exec'), source_namespace)
+        namespace = {}
+        for source in parameters:
+            parameter = parser.parse(source).obj
+            namespace[parameter.name] = eval(parameter.code, source_namespace)
+        namespace.update(source_namespace)
+        namespace.pop('__builtins__', None)
+
+    return SolvePlan(variables, x0, lower_bounds, upper_bounds, plan_blocks, namespace, grid_names, grid_values,
+                     parameters, namespace_source)
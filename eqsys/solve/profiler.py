@@ -0,0 +1,145 @@
+import json
+import time
+import types
+from collections import defaultdict
+
+
+class BlockRecord:
+    """ a block solved at a grid point: wall time, solver counters and time spent in namespace functions """
+    __slots__ = ('grid_index', 'block_index', 'variables', 'start', 'duration', 'evaluations', 'iterations', 'nfev',
+                 'njev', 'residual_norm', 'converged', 'failure', 'functions')
+
+    def __init__(self, grid_index: int, block_index: int, variables: int, start: float):
+        self.grid_index = grid_index
+        self.block_index = block_index
+        self.variables = variables
+        self.start = start
+        self.duration = 0.0
+        # calls of the residual function, including those for finite differences
+        self.evaluations = 0
+        self.iterations = None
+        self.nfev = None
+        self.njev = None
+        self.residual_norm = None
+        self.converged = None
+        self.failure = 0
+        # name: [calls, seconds]
+        self.functions = defaultdict(lambda: [0, 0.0])
+
+    def args(self) -> dict:
+        return {'grid_index': self.grid_index, 'block': self.block_index + 1, 'variables': self.variables,
+                'evaluations': self.evaluations, 'iterations': self.iterations, 'nfev': self.nfev, 'njev': self.njev,
+                'residual_norm': self.residual_norm, 'converged': self.converged, 'failure': self.failure,
+                'functions': {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in self.functions.items()}}
+
+
+class SolveProfiler:
+    """
+    opt-in instrumentation of a solve, set as SolverInterface.profiler
+    records every block solved at every grid point, and the time spent inside the functions of the namespace,
+    which are wrapped while the profiler is set (time is inclusive, a function calling another is charged both)
+    the records are exported as a chrome trace (chrome://tracing, ui.perfetto.dev) and summarized as a table
+    """
+
+    def __init__(self):
+        self.blocks = []
+        self.origin = time.perf_counter()
+        self._block = None
+
+    def clear(self) -> None:
+        self.blocks = []
+        self.origin = time.perf_counter()
+        self._block = None
+
+    def wrap_namespace(self, namespace: dict) -> dict:
+        """ a copy of the namespace with the functions replaced by timed wrappers """
+        wrapped = dict(namespace)
+        for name, value in namespace.items():
+            if isinstance(value, (types.FunctionType, types.BuiltinFunctionType)):
+                wrapped[name] = self._timed(name, value)
+        return wrapped
+
+    def _timed(self, name: str, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if self._block is not None:
+                    record = self._block.functions[name]
+                    record[0] += 1
+                    record[1] += time.perf_counter() - start
+        timed.__name__ = getattr(func, '__name__', name)
+        timed.__wrapped__ = func
+        return timed
+
+    def start_block(self, grid_index: int, block_index: int, variables: int) -> BlockRecord:
+        self._block = BlockRecord(grid_index, block_index, variables, time.perf_counter())
+        self.blocks.append(self._block)
+        return self._block
+
+    def end_block(self, result=None, failure: int = 0, evaluations: int = 0, converged: bool = None) -> None:
+        """ result is the SolverResult of the block, None if the block failed, converged overrides that of the result """
+        block, self._block = self._block, None
+        block.duration = time.perf_counter() - block.start
+        block.failure = failure
+        block.evaluations = evaluations
+        if result is not None:
+            block.iterations = result.iterations
+            block.nfev = result.nfev
+            block.njev = result.njev
+            block.residual_norm = result.residual_norm
+            block.converged = result.converged if converged is None else converged
+        else:
+            block.converged = False
+
+    def trace(self) -> dict:
+        """ chrome trace event format, a complete event per block with the counters as args, times in microseconds """
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': 0, 'args': {'name': 'solve'}}]
+        for block in self.blocks:
+            start = (block.start - self.origin) * 1e6
+            events.append({'name': f'block {block.block_index + 1}', 'cat': 'block', 'ph': 'X', 'pid': 0, 'tid': 0,
+                           'ts': start, 'dur': block.duration * 1e6, 'args': block.args()})
+            # namespace functions as one event per function, laid out after each other inside the block
+            offset = start
+            for name, (calls, seconds) in block.functions.items():
+                events.append({'name': name, 'cat': 'function', 'ph': 'X', 'pid': 0, 'tid': 0,
+                               'ts': offset, 'dur': seconds * 1e6, 'args': {'calls': calls}})
+                offset += seconds * 1e6
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_trace(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.trace(), f)
+
+    def block_totals(self) -> list[tuple]:
+        """ (block index, runs, seconds, evaluations, worst residual norm, not converged) by seconds, slowest first """
+        totals = {}
+        for block in self.blocks:
+            runs, seconds, evaluations, norm, failed = totals.get(block.block_index, (0, 0.0, 0, 0.0, 0))
+            if block.residual_norm is not None:
+                norm = max(norm, block.residual_norm)
+            totals[block.block_index] = (runs + 1, seconds + block.duration, evaluations + block.evaluations, norm,
+                                         failed + (not block.converged))
+        return sorted(((index, *total) for index, total in totals.items()), key=lambda total: -total[2])
+
+    def function_totals(self) -> list[tuple]:
+        """ (name, calls, seconds) by seconds, slowest first """
+        totals = defaultdict(lambda: [0, 0.0])
+        for block in self.blocks:
+            for name, (calls, seconds) in block.functions.items():
+                totals[name][0] += calls
+                totals[name][1] += seconds
+        return sorted(((name, calls, seconds) for name, (calls, seconds) in totals.items()), key=lambda total: -total[2])
+
+    def summary(self, top: int = 10) -> str:
+        lines = [f"{'block':>6} {'runs':>6} {'total [s]':>10} {'evals':>8} {'max |r|':>10} {'failed':>7}"]
+        for index, runs, seconds, evaluations, norm, failed in self.block_totals()[:top]:
+            lines.append(f"{index + 1:>6} {runs:>6} {seconds:>10.4f} {evaluations:>8} {norm:>10.3g} {failed:>7}")
+        functions = self.function_totals()[:top]
+        if functions:
+            lines.append("")
+            lines.append(f"{'function':>20} {'calls':>8} {'total [s]':>10}")
+            for name, calls, seconds in functions:
+                lines.append(f"{name:>20} {calls:>8} {seconds:>10.4f}")
+        return "\n".join(lines)
@@ -0,0 +1,66 @@
+import time
+
+
+class SolveProgress:
+    """
+    counters of the running solve, written by the thread which solves and read by the gui when it polls (e.g. 10 Hz)
+    the counters are plain attributes, so reading needs no lock and a snapshot can be off by one block
+    runs taken from a journal count as done, but not in the rate used for the ETA
+    """
+
+    def __init__(self):
+        self.reset(0, 0)
+        self.running = False
+
+    def reset(self, points_total: int, blocks_total: int) -> None:
+        self.points_total = points_total
+        self.blocks_total = blocks_total
+        self.points_done = 0
+        self.points_skipped = 0
+        # committed with a failure code
+        self.points_failed = 0
+        self.blocks_done = 0
+        self.evaluations = 0
+
+        # the grid point and block being solved
+        self.grid_index = 0
+        self.block_index = 0
+
+        self.start_time = time.perf_counter()
+        self.end_time = None
+        self.running = True
+
+    def finish(self) -> None:
+        self.end_time = time.perf_counter()
+        self.running = False
+
+    @property
+    def elapsed(self) -> float:
+        end_time = self.end_time if self.end_time is not None else time.perf_counter()
+        return end_time - self.start_time
+
+    def eta(self) -> float | None:
+        """ seconds left, from the time per solved run so far """
+        solved = self.points_done - self.points_skipped
+        if solved <= 0:
+            return None
+        return self.elapsed / solved * (self.points_total - self.points_done)
+
+    def message(self) -> str:
+        message = (f"Solving: Run {self.grid_index + 1}/{self.points_total}, block {self.block_index + 1}/{self.blocks_total}, "
+                   f"{self.blocks_done} blocks, {self.evaluations} evaluations")
+        if self.points_failed:
+            message += f", {self.points_failed} runs failed"
+        eta = self.eta()
+        if eta is not None:
+            minutes, seconds = divmod(int(eta), 60)
+            message += f", {minutes:02d}:{seconds:02d} left"
+        return message
+
+
+class EvaluationCounter:
+    """ residual evaluations of a method raced on a worker thread, added to the progress once the race is over """
+    __slots__ = ('evaluations',)
+
+    def __init__(self):
+        self.evaluations = 0
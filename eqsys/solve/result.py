@@ -1,28 +1,292 @@
+import os
+import mmap
+import time
+import tempfile
+import itertools
+import threading
 from collections import OrderedDict
 import numpy as np
-from PyQt6.QtCore import QObject, pyqtSignal
+from eqsys.observer import Signal
 
 
 class ResultsEntry:
-    def __init__(self, variables: list):
+    """
+    rows are stored in a preallocated array which doubles in size when full, so committing a row is amortized O(1)
+    data is a view of the committed rows, variables which are not solved in a row are nan
+    information holds a column of metadata for each row, e.g. the grid parameters, stored in arrays like data
+    a column of an array value (e.g. a value per block) is 2d, with a row of the length of the value
+    """
+    def __init__(self, variables: list, capacity: int = 16):
         self.variables = variables
-        self.information = {}  # todo: additional information, grid vars/parameters/block/solve time etc
-        self.data = np.empty((0, len(variables)))
-        self.temp_results = np.empty(len(variables))
+        # column index of each variable
+        self.columns = {variable: index for index, variable in enumerate(variables)}
+        self.size = 0
+        self._data = self._allocate(max(capacity, 1))
+        self.temp_results = np.full(len(variables), np.nan)
 
+        # metadata columns by name, and the metadata of the current row
+        self._information = {}
+        self.temp_information = {}
 
-class ResultsManager(QObject):
-    data_changed = pyqtSignal()
+    def __len__(self):
+        return self.size
 
-    def __init__(self):
-        super().__init__()
+    @property
+    def data(self) -> np.ndarray:
+        return self._data[:self.size]
+
+    @property
+    def information(self) -> dict[str, np.ndarray]:
+        return {name: column[:self.size] for name, column in self._information.items()}
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        return np.full((capacity, len(self.variables)), np.nan)
+
+    def reserve(self, capacity: int) -> None:
+        """ grows the array to hold at least capacity rows """
+        if capacity <= self.capacity:
+            return
+        data = self._allocate(capacity)
+        data[:self.size] = self._data[:self.size]
+        self._data = data
+        self._reserve_information(capacity)
+
+    def _reserve_information(self, capacity: int) -> None:
+        for name, column in self._information.items():
+            new_column = self._allocate_information(name, capacity, column.dtype, column.shape[1:])
+            new_column[:self.size] = column[:self.size]
+            self._information[name] = new_column
+
+    @staticmethod
+    def _missing(dtype):
+        """ the value of rows without the metadata: nan for floats, -1 for integers and None otherwise """
+        dtype = np.dtype(dtype)
+        if dtype.kind in 'fc':
+            return np.nan
+        elif dtype.kind in 'iu':
+            return -1
+        return None
+
+    def _allocate_information(self, name: str, capacity: int, dtype, shape: tuple = ()) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        if dtype.kind not in 'fciu':
+            dtype = np.dtype(object)
+        return np.full((capacity, *shape), self._missing(dtype), dtype)
+
+    def set_information(self, name: str, value, dtype=None) -> None:
+        """
+        sets metadata of the current row, the column is created with dtype, or float/object from the first value
+        an array value gets a 2d column of its dtype and length
+        """
+        if name not in self._information:
+            shape = ()
+            if isinstance(value, np.ndarray):
+                shape = value.shape
+                dtype = dtype or value.dtype
+            elif dtype is None:
+                dtype = np.float64 if isinstance(value, (int, float)) and not isinstance(value, bool) else object
+            self._information[name] = self._allocate_information(name, self.capacity, dtype, shape)
+        self.temp_information[name] = value
+
+    def add_results(self, variables: list[str], results) -> None:
+        """ sets the results of the variables in the current row """
+        try:
+            indices = [self.columns[variable] for variable in variables]
+        except KeyError as e:
+            raise ValueError(f"The variable '{e.args[0]}' is not in the variables list.") from None
+        self.temp_results[indices] = results
+
+    def commit(self) -> None:
+        """ appends the current row and starts a new one """
+        if self.size == self.capacity:
+            self.reserve(2 * self.capacity)
+        self._data[self.size] = self.temp_results
+        for name, value in self.temp_information.items():
+            self._information[name][self.size] = value
+        self.size += 1
+        self.temp_results.fill(np.nan)
+        self.temp_information.clear()
+
+    def close(self) -> None:
+        """ releases the storage of the entry """
+        pass
+
+
+class DiskResultsEntry(ResultsEntry):
+    """
+    results entry stored in a memory mapped .npy file in directory, so rows are written to disk during the solve
+    data is a view of the mapped file with the committed rows, the file has capacity rows
+    numeric information columns are mapped in .npy files beside it, they are not filled in advance, a row gets the
+    missing value of the columns it does not set when it is committed. other columns (e.g. strings) stay in memory
+    written rows are flushed and released from memory in chunks, so memory use does not grow with the number of rows
+    growing copies the rows to new files in chunks
+    """
+    # bytes copied or released at a time
+    chunk_bytes = 2 ** 24
+    _ids = itertools.count()
+
+    def __init__(self, variables: list, directory: str, capacity: int = 16):
+        self.directory = directory
+        self.name = f"entry-{os.getpid()}-{next(self._ids)}"
+        self.path = None
+        self._generation = 0
+        self._chunk_rows = max(1, self.chunk_bytes // (8 * max(len(variables), 1)))
+        # files of the mapped information columns by name
+        self._information_paths = {}
+        self._information_files = itertools.count()
+        super().__init__(variables, capacity)
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        """ creates a new file, the file is sparse until rows are written """
+        self._generation += 1
+        self.path = os.path.join(self.directory, f"{self.name}.{self._generation}.npy")
+        return np.lib.format.open_memmap(self.path, mode='w+', dtype=np.float64, shape=(capacity, len(self.variables)))
+
+    def _allocate_information(self, name: str, capacity: int, dtype, shape: tuple = ()) -> np.ndarray:
+        """ a new sparse file for a numeric column, the rows are not filled """
+        dtype = np.dtype(dtype)
+        if dtype.kind not in 'fciu':
+            return super()._allocate_information(name, capacity, dtype, shape)
+        path = os.path.join(self.directory, f"{self.name}.information-{next(self._information_files)}.npy")
+        self._information_paths[name] = path
+        return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(capacity, *shape))
+
+    def set_information(self, name: str, value, dtype=None) -> None:
+        new = name not in self._information
+        super().set_information(name, value, dtype)
+        if new and self.size:
+            # a column added after the first rows
+            column = self._information[name]
+            column[:self.size] = self._missing(column.dtype)
+
+    def reserve(self, capacity: int) -> None:
+        if capacity <= self.capacity:
+            return
+        old_data, old_path = self._data, self.path
+        self._data = self._allocate(capacity)
+        self._copy(old_data, self._data, self.size)
+        del old_data
+        self._remove(old_path)
+        self._reserve_information(capacity)
+
+    def _reserve_information(self, capacity: int) -> None:
+        for name, column in self._information.items():
+            old_path = self._information_paths.get(name)
+            new_column = self._allocate_information(name, capacity, column.dtype, column.shape[1:])
+            self._copy(column, new_column, self.size)
+            self._information[name] = new_column
+            del column
+            self._remove(old_path)
+
+    def _copy(self, old: np.ndarray, new: np.ndarray, rows: int) -> None:
+        """ copies the first rows in chunks, releasing the copied rows """
+        chunk_rows = max(1, self.chunk_bytes // max(old.strides[0], 1))
+        for start in range(0, rows, chunk_rows):
+            end = min(start + chunk_rows, rows)
+            new[start:end] = old[start:end]
+            if isinstance(new, np.memmap):
+                self._release_rows(new, start, end)
+
+    def commit(self) -> None:
+        if self.size == self.capacity:
+            self.reserve(2 * self.capacity)
+        for name, column in self._information.items():
+            if name not in self.temp_information and isinstance(column, np.memmap):
+                column[self.size] = self._missing(column.dtype)
+        super().commit()
+        if self.size % self._chunk_rows == 0:
+            self._release(self.size - self._chunk_rows, self.size)
+
+    def _release(self, start: int, end: int) -> None:
+        """ writes rows start to end to the files and drops their pages from memory, they are read back when used """
+        for array in (self._data, *self._information.values()):
+            if isinstance(array, np.memmap):
+                self._release_rows(array, start, end)
+
+    @staticmethod
+    def _release_rows(array: np.memmap, start: int, end: int) -> None:
+        row_bytes = array.strides[0]
+        # the mapping starts at the allocation boundary before the header
+        offset = array.offset % mmap.ALLOCATIONGRANULARITY
+        first = offset + start * row_bytes
+        last = offset + end * row_bytes
+        first += -first % mmap.PAGESIZE
+        last -= last % mmap.PAGESIZE
+        if last <= first:
+            return
+        array._mmap.flush(first, last - first)
+        if hasattr(mmap, 'MADV_DONTNEED'):
+            array._mmap.madvise(mmap.MADV_DONTNEED, first, last - first)
+
+    def flush(self) -> None:
+        """ writes the mapped rows to the files """
+        for array in (self._data, *self._information.values()):
+            if isinstance(array, np.memmap):
+                array.flush()
+
+    def close(self) -> None:
+        """ deletes the files, views of data and information which are still in use keep their mapping """
+        self._data = np.empty((0, len(self.variables)))
+        self._information = {}
+        self.size = 0
+        self._remove(self.path)
+        self.path = None
+        for path in self._information_paths.values():
+            self._remove(path)
+        self._information_paths = {}
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        if path is None:
+            return
+        try:
+            os.remove(path)
+        except OSError:
+            # still mapped (windows), it is left in the directory
+            pass
+
+
+class ResultsManager:
+    """
+    entries larger than memory_limit bytes are stored on disk in directory, a temporary directory if not given
+    with memory_limit None all entries are kept in memory
+    entry_created, entry_deleted, entry_renamed and rows_committed tell which entry changed,
+    data_changed is emitted on any change
+    rows_committed is emitted at most every notify_interval seconds per entry, so rows reach the gui in batches,
+    flush_notifications emits for the rows held back, the gui calls it from the timer polling the solve progress
+    """
+    data_changed = Signal()
+    entry_created = Signal()
+    entry_deleted = Signal()
+    entry_renamed = Signal()
+    rows_committed = Signal()
+
+    def __init__(self, directory: str = None, memory_limit: int = None):
         self.base_name = "Entry"
         self.entries = OrderedDict()
 
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self._temporary_directory = None
+
+        self.notify_interval = 0.0
+        self._last_notify = 0.0
+        # entries with rows which have not been notified, commits and flushes can be in different threads
+        self._unnotified = set()
+        self._notify_lock = threading.Lock()
+
     def _updated(self):
         self.data_changed.emit()
 
-    def create_entry(self, variables: list[str]):
+    def create_entry(self, variables: list[str], capacity: int = 16, information_bytes: int = 0):
+        """
+        capacity is the number of rows to preallocate, e.g. the size of the grid
+        information_bytes is the expected size of the information of a row, counted against memory_limit with the data
+        """
         # Determine the name for the new entry
         highest_number = 0
         for name in self.entries.keys():
@@ -34,16 +298,40 @@ class ResultsManager(QObject):
                     continue
         new_name = f"{self.base_name} {highest_number + 1}"
 
-        self.entries[new_name] = ResultsEntry(variables)
+        if self.memory_limit is not None and capacity * (8 * len(variables) + information_bytes) > self.memory_limit:
+            self.entries[new_name] = DiskResultsEntry(variables, self._entry_directory(), capacity)
+        else:
+            self.entries[new_name] = ResultsEntry(variables, capacity)
+        self.entry_created.emit(new_name)
         self._updated()
         return new_name
 
+    def _entry_directory(self) -> str:
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            return self.directory
+        if self._temporary_directory is None:
+            self._temporary_directory = tempfile.mkdtemp(prefix='pies-results-')
+        return self._temporary_directory
+
+    def close(self) -> None:
+        """ deletes the files of the entries stored on disk """
+        for entry in self.entries.values():
+            entry.close()
+        if self._temporary_directory is not None:
+            try:
+                os.rmdir(self._temporary_directory)
+            except OSError:
+                pass
+            self._temporary_directory = None
+
     def delete_entry(self, name):
         # Remove an entry from the dictionary by name
         if name not in self.entries:
             raise KeyError(f"No entry named '{name}' found.")
 
-        del self.entries[name]
+        self.entries.pop(name).close()
+        self.entry_deleted.emit(name)
         self._updated()
 
     def rename_entry(self, old_name, new_name):
@@ -60,18 +348,34 @@ class ResultsManager(QObject):
         keys[index] = new_name
 
         self.entries = OrderedDict(zip(keys, values))
+        self.entry_renamed.emit(old_name, new_name)
         self._updated()
         
     def commit_results(self, name):
         """ commit the row to the entry once all variables is solved"""
-        self.entries[name].data = np.vstack([self.entries[name].data, self.entries[name].temp_results])
-        self.entries[name].temp_results = np.empty(len(self.entries[name].variables))
-        self._updated()
+        self.entries[name].commit()
+        with self._notify_lock:
+            self._unnotified.add(name)
+            if time.monotonic() - self._last_notify < self.notify_interval:
+                return
+        self.flush_notifications()
+
+    def flush_notifications(self):
+        """ emits rows_committed for the entries with rows which have not been notified """
+        with self._notify_lock:
+            names, self._unnotified = self._unnotified, set()
+            self._last_notify = time.monotonic()
+        for name in names:
+            if name in self.entries:
+                self.rows_committed.emit(name)
+        if names:
+            self._updated()
     
     def add_results(self, name, variables: list[str], results: list[float]):
         """ build a result row """
-        for variable, result in zip(variables, results):
-            if variable not in self.entries[name].variables:
-                raise ValueError(f"The variable '{variable}' is not in the variables list.")
-            index = self.entries[name].variables.index(variable)
-            self.entries[name].temp_results[index] = result
+        self.entries[name].add_results(variables, results)
+
+    def add_information(self, name, information: dict, dtype=None):
+        """ sets metadata of the row, e.g. the grid parameters """
+        for key, value in information.items():
+            self.entries[name].set_information(key, value, dtype)
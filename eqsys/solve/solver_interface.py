@@ -1,20 +1,64 @@
+import os
 import ast
 import time
-import autograd.numpy as np
-from eqsys.solve.solvers import solver_wrapper
-from PyQt6.QtCore import QObject, pyqtSignal
+import logging
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+from eqsys.solve.solvers import solver_wrapper, METHOD_RACE, METHOD_KRYLOV
+from eqsys.solve.journal import Journal
+from eqsys.solve.plan import SolvePlan
+from eqsys.solve.progress import SolveProgress, EvaluationCounter
+from eqsys.solve.profiler import SolveProfiler
+from eqsys.solve.cancel import CancellationToken, SolveCancelled, BudgetExceeded, RaceLost, FAILURE_NONE, FAILURE_BLOCK_TIME, FAILURE_POINT_TIME, \
+    FAILURE_NOT_CONVERGED, FAILURE_ERROR
+from eqsys.observer import Signal
 from eqsys.equationsystem import EquationSystem
-from eqsys.solve.result import ResultsManager
 
+if TYPE_CHECKING:
+    from eqsys.solve.result import ResultsManager
 
-class SolverInterface(QObject):
-    solve_status = pyqtSignal(str)
-    solve_error = pyqtSignal(str, object)
 
-    def __init__(self, equation_system: EquationSystem, results_manager: ResultsManager):
-        super().__init__()
+class SolverInterface:
+    """ 
+    solve_status and solve_error are emitted from the thread which solves
+    numpy and the solvers are imported on first solve, so importing the interface stays cheap
+    with a journal directory every row solved without failure is journaled, solve(resume=True) skips the grid points
+    journaled by a sweep of the same system which did not finish or had failed runs
+    progress is updated while solving and is meant to be polled, solve_status is emitted when the solve ends
+    and, if status_interval is set, at most every status_interval seconds while solving
+    cancel_token stops the solve from another thread, the rows committed so far are kept
+    settings block_time and point_time are time budgets in seconds for a block and a run, a run which exceeds
+    a budget is committed with the unsolved variables as nan and the failure code and block in its information.
+    budgets are checked at every residual evaluation, with a budget newton takes its jacobian by finite differences
+    (a residual evaluation per column) instead of autograd, so a budget is overrun by at most one evaluation
+    of the residuals plus the linear solve of a step
+    profiler is None, or a SolveProfiler which records every block solved
+    every row carries its grid point, failure, solve_time and per block (a 2d column, one value per block):
+    block_iterations, block_residual_norm, block_method, block_converged, block_attempts and block_time,
+    blocks which were not solved in the row are -1 or nan
+    a block is solved with method, and on failure with each method of settings fallbacks in turn (see solvers),
+    a solution is accepted if the method converged to a residual norm of at most residual_tolerance.
+    a block which fails with every method leaves the rest of the row unsolved, the row is committed with
+    failure FAILURE_NOT_CONVERGED or FAILURE_ERROR and the sweep goes on with the next grid point
+    with method METHOD_RACE the methods of settings race solve each block at once on a pool of threads, the first
+    accepted solution wins and the method is tried first for the block at the following grid points.
+    the threads share the GIL, so the methods take turns rather than run in parallel: a race takes about as long as
+    the winner times the number of methods, and pays off when the methods differ a lot in time, e.g. one does not converge.
+    raced methods take jacobians by finite differences, so the losers stop within one residual evaluation and the
+    race returns once they have stopped
+    blocks of at least settings krylov_size unknowns are solved first with newton krylov, which does not form the
+    jacobian, preconditioned by the incidence of the block if krylov_preconditioner
+    method 7 solves a block by gauss-seidel substitution with the matching of the plan (see create_residual_func)
+    """
+    solve_status = Signal()
+    solve_error = Signal()
+
+    def __init__(self, equation_system: EquationSystem, results_manager: 'ResultsManager', journal_directory: str = None):
         self.eqsys = equation_system
         self.results_manager = results_manager
+        self.journal_directory = journal_directory
         
         # selects the solver from the solver wrapper
         self.method = 1
@@ -22,41 +66,69 @@ class SolverInterface(QObject):
         # for sending fail information
         self.current_block_info = ""
         self.current_grid_info = ""
+
+        # time spent on each block in the last solve: (grid index, block index, number of variables, seconds)
+        self.block_times = []
+
+        self.progress = SolveProgress()
+        self.cancel_token = CancellationToken()
+        # time and failure code of the budget which ends first in the block being solved
+        self._deadline = None
+        self.status_interval = None
+        self._last_status = 0.0
+        self.profiler: SolveProfiler | None = None
+
+        # method which won the race of each block in the last solve, and the workers of the race
+        self.race_winners = {}
+        self._pool = None
         
     
         # todo print verbose to output
-        self.settings = {'tolerance': 1e-10, 'max_iter': 500, 'verbose': False, 'method': -1}
+        self.settings = {'tolerance': 1e-10, 'max_iter': 500, 'verbose': False, 'method': -1,
+                         'block_time': None, 'point_time': None,
+                         'fallbacks': [3, 4, 5], 'residual_tolerance': 1e-6, 'race': [0, 1, 3],
+                         'krylov_size': None, 'krylov_preconditioner': True}
     
     def status(self, status: str):
-        # todo: show time and iteration
         solve_message = f"{status}: Run {self.current_grid_info}, block {self.current_block_info}"
         self.solve_status.emit(solve_message)
+
+    def progress_status(self):
+        """ emits the progress if status_interval has passed since the last time """
+        if self.status_interval is None:
+            return
+        now = time.perf_counter()
+        if now - self._last_status >= self.status_interval:
+            self._last_status = now
+            self.solve_status.emit(self.progress.message())
         
     # todo: do we need this? we must remember we need to refresh the namespace
     
     def set_solver(self, solver: int):
         self.method = solver
 
-    def create_namespace(self):
-        # todo bugged since we should build the whole namespace and then exec, parameters could be added
-        new_namespace = {}
-        
-        for name, parameter in self.eqsys.parameters.items():
-            new_namespace[name] = eval(parameter.code, self.eqsys.namespace)
-        
-        # namespace window overrides parameters currently
-        new_namespace.update(self.eqsys.namespace)
-        
-        if '__builtins__' in new_namespace:
-            del new_namespace['__builtins__']
-
-        return new_namespace
+    def compile_plan(self) -> SolvePlan:
+        """ snapshot of the equation system to solve, call on the thread which edits the equation system """
+        return SolvePlan.compile(self.eqsys)
     
-    def solve(self):
+    def check(self):
+        """ called between runs and blocks and in the residual function """
+        self.cancel_token.check()
+        if self._deadline is not None and time.perf_counter() > self._deadline[0]:
+            raise BudgetExceeded(self._deadline[1])
+
+    def solve(self, resume=False, plan: SolvePlan = None):
+        """ solves the plan, or a plan compiled from the equation system if none is given """
         start_time = time.time()            
+        self.cancel_token.reset()
         try:
-            self._solve()
+            self._solve(plan if plan is not None else self.compile_plan(), resume)
+        except SolveCancelled:
+            self.progress.finish()
+            self.status('Cancelled after {:.2f} seconds'.format(time.time() - start_time))
+            return
         except Exception as e:
+            self.progress.finish()
             # delete empty entries 
             # self.results_manager.entries[entry_name]
             
@@ -66,85 +138,385 @@ class SolverInterface(QObject):
             self.status('Failed after {:.2f} seconds'.format(elapsed_time))
             return
         
+        self.progress.finish()
         end_time = time.time()
         elapsed_time = end_time - start_time
         
-        self.status('Finished in {:.2f} seconds'.format(elapsed_time))
+        failed = f', {self.progress.points_failed} runs failed' if self.progress.points_failed else ''
+        self.status('Finished in {:.2f} seconds{}'.format(elapsed_time, failed))
         
-    def _solve(self) -> None:
-        # todo move results stuff out into solve? at least when saving so we are sure we get partial results even if failing
-        # create new entry for storing results
-        variables = list(self.eqsys.variables.keys())
-        entry_name = self.results_manager.create_entry(variables=variables)
-        namespace = self.create_namespace()
-        # prepare
-        blocks = self.eqsys.blocking()
-        grid = self.eqsys.grid.get_grid()  # Assuming grid is an instance of a class that has the get_grid() method
-        
-        for entry in grid:
+    def _solve(self, plan: SolvePlan, resume=False) -> None:
+        # only the plan is read from here, the equation system can change while solving
+        variables = list(plan.variables)
+        # the residuals are evaluated in a copy, since eval adds to the globals
+        namespace = dict(plan.namespace)
+        if self.profiler is not None:
+            namespace = self.profiler.wrap_namespace(namespace)
+        # one row per grid point
+        # per row: the per block columns, the grid point, grid index, failure, failed block and solve time
+        information_bytes = sum(column.nbytes for column in self.block_information(len(plan.blocks)).values()) \
+            + 8 * (len(plan.grid_names) + 4)
+        entry_name = self.results_manager.create_entry(variables=variables, capacity=plan.grid_size,
+                                                       information_bytes=information_bytes)
+        self.block_times = []
+        self.race_winners = {}
+
+        # imported here, so the first block is not charged the import time in block_times and budgets
+        importlib.import_module('autograd')
+        importlib.import_module('scipy.optimize')
+        self.progress.reset(plan.grid_size, len(plan.blocks))
+
+        journal = None
+        if self.journal_directory is not None:
+            journal_path = os.path.join(self.journal_directory, plan.key + '.journal')
+            journal = Journal(journal_path, variables, resume=resume)
+        try:
+            self._solve_grid(plan, entry_name, namespace, journal)
+        except BaseException:
+            # the rows solved so far are kept for resuming
+            if journal is not None:
+                journal.close()
+            raise
+        finally:
+            # rows held back by the notify interval
+            self.results_manager.flush_notifications()
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+        if journal is not None:
+            # kept while runs failed, so resuming tries them again
+            if self.progress.points_failed:
+                journal.close()
+            else:
+                journal.remove()
+
+    def solve_block(self, make_residual, x0, lb, ub, block_index: int = None, sparsity=None) -> tuple:
+        """
+        tries method and then the fallbacks until a solution is accepted
+        sparsity is for each residual the indices of the variables in it, see block_sparsity
+        make_residual() returns the residual function of the block, make_residual(check, counter) one with its own copy
+        of the variables which calls check before each evaluation and counts the evaluations in counter
+        with method METHOD_RACE the methods of settings race are raced, unless the block was won before in this solve,
+        then the winner is tried first
+        returns the accepted result or the one with the smallest residual norm (None if every method raised),
+        whether it was accepted, the number of methods tried and the last error raised
+        """
+        import numpy as np
+
+        if self.method == METHOD_RACE:
+            winner = self.race_winners.get(block_index)
+            raced = [method for method in dict.fromkeys(self.settings['race']) if method != winner]
+            stages = ([winner] if winner is not None else []) + [raced] + \
+                     [method for method in self.settings['fallbacks'] if method not in raced and method != winner]
+        else:
+            stages = list(dict.fromkeys([self.method, *self.settings['fallbacks']]))
+        if self.settings['krylov_size'] is not None and len(x0) >= self.settings['krylov_size']:
+            stages = [METHOD_KRYLOV] + [stage for stage in stages if stage != METHOD_KRYLOV]
+        if not self.settings['krylov_preconditioner']:
+            sparsity = None
+
+        residual_func = None
+        best, best_norm, error = None, np.inf, None
+        attempts = 0
+        for stage in stages:
+            if isinstance(stage, list):
+                attempts += len(stage)
+                result, accepted, race_error = self.race(make_residual, x0, lb, ub, stage, sparsity)
+                error = race_error or error
+                if accepted:
+                    self.race_winners[block_index] = result.method
+                    return result, True, attempts, error
+            else:
+                attempts += 1
+                residual_func = residual_func or make_residual()
+                try:
+                    result = self.solve_method(residual_func, x0, lb, ub, stage, sparsity)
+                except (BudgetExceeded, SolveCancelled):
+                    raise
+                except Exception as e:
+                    # e.g. a singular jacobian, newton not converging or residuals which cannot be evaluated
+                    error = e
+                    continue
+                if self.accepted(result):
+                    return result, True, attempts, error
+            if result is not None:
+                norm = result.residual_norm if np.isfinite(result.residual_norm) else np.inf
+                if best is None or norm < best_norm:
+                    best, best_norm = result, norm
+        return best, False, attempts, error
+
+    def solve_method(self, residual_func, x0, lb, ub, method: int, sparsity=None, interruptible=False):
+        return solver_wrapper(residual_func=residual_func,
+                              initial_guesses=x0,
+                              bounds=(lb, ub),
+                              tol=self.settings['tolerance'],
+                              max_iter=self.settings['max_iter'],
+                              verbose=self.settings['verbose'],
+                              method=method,
+                              full_output=True,
+                              sparsity=sparsity,
+                              interruptible=interruptible or self._deadline is not None)
+
+    def accepted(self, result) -> bool:
+        import numpy as np
+        return bool(result.converged and result.residual_norm <= self.settings['residual_tolerance']
+                    and np.all(np.isfinite(result.x)))
+
+    def race(self, make_residual, x0, lb, ub, methods: list[int], sparsity=None) -> tuple:
+        """
+        solves the block with every method at once on the worker pool, each with its own residual function and
+        evaluation counter, the counts are added to progress once every method has stopped
+        the first accepted result wins, the others stop at their next residual evaluation and are waited for
+        returns the winning result or the one with the smallest residual norm, whether it was accepted and the last error
+        """
+        import numpy as np
+        from concurrent.futures import wait, FIRST_COMPLETED
+
+        lost = threading.Event()
+
+        def check():
+            if lost.is_set():
+                raise RaceLost()
+            self.check()
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=max(len(self.settings['race']), 1), thread_name_prefix='race')
+        counters = [EvaluationCounter() for _ in methods]
+        pending = {self._pool.submit(self.solve_method, make_residual(check, counter), x0.copy(), lb, ub, method, sparsity, True)
+                   for method, counter in zip(methods, counters)}
+        best, best_norm, error = None, np.inf, None
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                # budgets and cancellation while the methods are running
+                self.check()
+                for future in done:
+                    try:
+                        result = future.result()
+                    except (BudgetExceeded, SolveCancelled):
+                        raise
+                    except Exception as e:
+                        error = e
+                        continue
+                    if self.accepted(result):
+                        return result, True, error
+                    norm = result.residual_norm if np.isfinite(result.residual_norm) else np.inf
+                    if best is None or norm < best_norm:
+                        best, best_norm = result, norm
+            return best, False, error
+        finally:
+            lost.set()
+            wait(pending)
+            self.progress.evaluations += sum(counter.evaluations for counter in counters)
+
+    @staticmethod
+    def block_sparsity(block, unsolved_vars: list[str]) -> tuple:
+        """ the incidence of the block restricted to the unsolved variables, indices are positions in unsolved_vars """
+        if block.incidence is None or len(unsolved_vars) == len(block.variables):
+            return block.incidence
+        columns = {var: column for column, var in enumerate(unsolved_vars)}
+        positions = [columns.get(var) for var in block.variables]
+        return tuple(tuple(positions[position] for position in residual if positions[position] is not None)
+                     for residual in block.incidence)
+
+    @staticmethod
+    def block_matching(block, unsolved_vars: list[str]) -> tuple | None:
+        """ the matching of the block with positions in unsolved_vars, None if a matched variable is solved """
+        if block.matching is None or len(unsolved_vars) != len(block.matching):
+            return None
+        columns = {var: column for column, var in enumerate(unsolved_vars)}
+        matching = tuple((residual, columns.get(block.variables[position])) for residual, position in block.matching)
+        return None if any(column is None for _, column in matching) else matching
+
+    @staticmethod
+    def block_information(n_blocks: int) -> dict:
+        """ the per block metadata of a row, before any block is solved """
+        import numpy as np
+        return {'block_iterations': np.full(n_blocks, -1, np.int32),
+                'block_residual_norm': np.full(n_blocks, np.nan),
+                'block_method': np.full(n_blocks, -1, np.int8),
+                'block_converged': np.full(n_blocks, -1, np.int8),
+                'block_attempts': np.full(n_blocks, -1, np.int8),
+                'block_time': np.full(n_blocks, np.nan)}
+
+    def _solve_grid(self, plan: SolvePlan, entry_name: str, namespace: dict, journal: Journal = None) -> None:
+        variables = list(plan.variables)
+        grid_size = plan.grid_size
+        for grid_index, entry in enumerate(plan.grid()):
+            # the grid point of the row
+            self.results_manager.add_information(entry_name, {'grid_index': grid_index}, dtype='int64')
+            self.results_manager.add_information(entry_name, entry)
+
+            if journal is not None and grid_index in journal.rows:
+                # solved before the sweep was interrupted, only runs which did not fail are journaled
+                self.results_manager.add_results(entry_name, variables, journal.rows[grid_index])
+                self.results_manager.add_information(entry_name, {'failure': FAILURE_NONE, 'failed_block': -1}, dtype='int64')
+                self.results_manager.commit_results(entry_name)
+                self.progress.points_done += 1
+                self.progress.points_skipped += 1
+                continue
+
             # solving for these variable
-            X = {var.name: None for var in self.eqsys.variables.values()}
+            X = dict.fromkeys(plan.variables)
             X.update(entry)  # add values from grid vars
 
-            for i, block in enumerate(blocks):
+            point_deadline = None
+            if self.settings['point_time'] is not None:
+                point_deadline = (time.perf_counter() + self.settings['point_time'], FAILURE_POINT_TIME)
+            failure, failed_block = FAILURE_NONE, -1
+            point_start = time.perf_counter()
+            information = self.block_information(len(plan.blocks))
+
+            for i, block in enumerate(plan.blocks):
+                self.cancel_token.check()
+                if point_deadline is not None and time.perf_counter() > point_deadline[0]:
+                    failure, failed_block = FAILURE_POINT_TIME, i
+                    break
                 # Update messages
-                self.current_block_info = f"{i + 1}/{len(blocks)}"
-                self.current_grid_info = f"{grid.index(entry) + 1}/{len(grid)}"
-                self.status('Solving')
+                self.current_block_info = f"{i + 1}/{len(plan.blocks)}"
+                self.current_grid_info = f"{grid_index + 1}/{grid_size}"
+                self.progress.grid_index = grid_index
+                self.progress.block_index = i
+                self.progress_status()
                 
-                # get what we need for solving the block
-                block_eqs = [self.eqsys.equations[eq] for eq in self.eqsys.equations if eq in block]
-                block_vars = list(set([var for eq in block_eqs for var in eq.objects if var in self.eqsys.variables]))
-
-                unsolved_vars = [var for var in block_vars if X[var] is None]
+                unsolved_vars = [var for var in block.variables if X[var] is None]
 
                 if not unsolved_vars:
                     continue
 
-                x0, lb, ub = self.variable_info(unsolved_vars)
-                res_f = self.create_residual_func(block_eqs, unsolved_vars, namespace, X)
+                block_start = time.perf_counter()
+                x0, lb, ub = self.variable_info(plan, unsolved_vars)
+                matching = self.block_matching(block, unsolved_vars)
+                def make_residual(check=None, counter=None, block=block, unsolved_vars=unsolved_vars, matching=matching):
+                    # raced methods get a copy of the variables, since the residual function writes to them,
+                    # and their own counter, since they run on other threads
+                    if check is None:
+                        return self.create_residual_func(block.residuals, unsolved_vars, namespace, X, self.progress, self.check, matching)
+                    return self.create_residual_func(block.residuals, unsolved_vars, namespace, dict(X), counter, check, matching)
+
+                self._deadline = point_deadline
+                if self.settings['block_time'] is not None:
+                    block_deadline = (block_start + self.settings['block_time'], FAILURE_BLOCK_TIME)
+                    self._deadline = min(block_deadline, point_deadline or block_deadline)
 
-                block_results = solver_wrapper(residual_func=res_f,
-                                               initial_guesses=x0,
-                                               bounds=(lb, ub),
-                                               tol=self.settings['tolerance'],
-                                               max_iter=self.settings['max_iter'],
-                                               verbose=self.settings['verbose'],
-                                               method=self.method)
+                if self.profiler is not None:
+                    self.profiler.start_block(grid_index, i, len(unsolved_vars))
+                    evaluations = self.progress.evaluations
+                result, accepted, attempts, error = None, False, 0, None
+                try:
+                    result, accepted, attempts, error = self.solve_block(make_residual, x0, lb, ub, i,
+                                                                         self.block_sparsity(block, unsolved_vars))
+                except BudgetExceeded as e:
+                    # the remaining blocks depend on this one, so the rest of the run is left unsolved
+                    failure, failed_block = e.failure, i
+                    information['block_time'][i] = time.perf_counter() - block_start
+                    self.block_times.append((grid_index, i, len(unsolved_vars), information['block_time'][i]))
+                    break
+                finally:
+                    self._deadline = None
+                    if self.profiler is not None:
+                        self.profiler.end_block(result, failure, self.progress.evaluations - evaluations, accepted)
 
+                information['block_attempts'][i] = attempts
+                information['block_converged'][i] = accepted
+                information['block_time'][i] = time.perf_counter() - block_start
+                self.block_times.append((grid_index, i, len(unsolved_vars), information['block_time'][i]))
+                if result is not None:
+                    information['block_iterations'][i] = result.iterations
+                    information['block_residual_norm'][i] = result.residual_norm
+                    information['block_method'][i] = result.method
+
+                if not accepted:
+                    # the row is committed with the rest unsolved and the sweep goes on
+                    failure = FAILURE_NOT_CONVERGED if result is not None else FAILURE_ERROR
+                    failed_block = i
+                    reason = f"residual norm {result.residual_norm:.3g}" if result is not None else str(error)
+                    logging.warning("Run %d/%d, block %d/%d failed after %d methods: %s",
+                                    grid_index + 1, grid_size, i + 1, len(plan.blocks), attempts, reason)
+                    break
+
+                block_results = result.x
                 X.update(zip(unsolved_vars, block_results))
+                self.progress.blocks_done += 1
 
                 # populate the row with variables just solved
                 self.results_manager.add_results(entry_name, unsolved_vars, block_results)
 
             # todo will this work if solving ends? move to solve
-            # todo: do not insert empty after fail
-            # after solving for all variables commit the results as a row
+            # after solving for all variables commit the results as a row, unsolved variables are nan
+            self.results_manager.add_information(entry_name, {'failure': failure, 'failed_block': failed_block}, dtype='int64')
+            information['solve_time'] = time.perf_counter() - point_start
+            self.results_manager.add_information(entry_name, information)
             self.results_manager.commit_results(entry_name)
+            # failed runs are not journaled, so resuming tries them again
+            if journal is not None and failure == FAILURE_NONE:
+                journal.append(grid_index, self.results_manager.entries[entry_name].data[-1])
+            if failure != FAILURE_NONE:
+                self.progress.points_failed += 1
+            self.progress.points_done += 1
             
             # add variables from solving results to the set of all variables which has solutions
             #self.all_variables.update(X.keys())  # todo what for??
 
-    def variable_info(self, query_variables: list[str]) -> tuple:
-        x0, lb, ub = [], [], []
-        for var_name in query_variables:
-            var = self.eqsys.variables[var_name]
-            x0.append(var.starting_guess)
-            lb.append(var.lower_bound)
-            ub.append(var.upper_bound)
-        return np.array(x0), np.array(lb), np.array(ub)
+    @staticmethod
+    def variable_info(plan: SolvePlan, query_variables: list[str]) -> tuple:
+        """ starting guesses and bounds of the variables, taken from the plan arrays in one step each """
+        indices = [plan.index[var_name] for var_name in query_variables]
+        return plan.x0[indices], plan.lower_bounds[indices], plan.upper_bounds[indices]
 
     @staticmethod
-    def create_residual_func(equations, variables, global_namespace, variable_namespace):
-        equation_residuals = [eq.residual for eq in equations]
+    def create_residual_func(residuals, variables, global_namespace, variable_namespace, progress: SolveProgress = None, check=None,
+                             matching=None):
+        """
+        residuals are the compiled residuals, counts the evaluations in progress (or an EvaluationCounter) and calls check
+        before each evaluation, if given
+        with the matching of the block (see PlanBlock) the function has an attribute sweep, the fixed point map of the
+        fixed point solver: one gauss-seidel sweep from x, where each matched variable in turn takes the step which zeroes
+        its residual to first order. the slopes are taken by finite differences in the first sweep and kept,
+        so a variable which the equation gives explicitly, x == f(...), is substituted directly
+        """
+        import autograd.numpy as np
+
+        equation_residuals = list(residuals)
         # compiled = [compile(expression, '<string>', 'eval') for expression in equation_residuals]
     
         def res_func(x):
+            if progress is not None:
+                progress.evaluations += 1
+            if check is not None:
+                check()
             # Update namespace with x's values of variables
             variable_namespace.update({var: val for var, val in zip(variables, x)})
             
             # Compute residuals
             res = [eval(eq, global_namespace, variable_namespace) for eq in equation_residuals]
             return np.array(res, dtype=float)
-    
+
+        if matching is None:
+            return res_func
+
+        slopes = [None] * len(matching)
+
+        def sweep(x):
+            # a sweep evaluates every residual once, like res_func
+            if progress is not None:
+                progress.evaluations += 1
+            if check is not None:
+                check()
+            x = [float(value) for value in x]
+            variable_namespace.update(zip(variables, x))
+            for k, (residual, position) in enumerate(matching):
+                var, value = variables[position], x[position]
+                res = eval(equation_residuals[residual], global_namespace, variable_namespace)
+                if slopes[k] is None:
+                    step = 1.4901161193847656e-08 * max(abs(value), 1.0)
+                    variable_namespace[var] = value + step
+                    slopes[k] = (eval(equation_residuals[residual], global_namespace, variable_namespace) - res) / step
+                    if not slopes[k]:
+                        raise ZeroDivisionError(f"the residual of {var} does not change with it")
+                x[position] = value - res / slopes[k]
+                variable_namespace[var] = x[position]
+            return np.array(x, dtype=float)
+
+        res_func.sweep = sweep
         return res_func
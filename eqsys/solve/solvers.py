@@ -1,40 +1,125 @@
-import autograd.numpy as np
-from autograd import jacobian
 import logging
-import scipy.optimize as sio
+
+# numpy, autograd and scipy are imported in the solvers, so importing the solving core stays cheap
 
 # Use a method selector to enable different solvers for debugging
 # method = -1: compare SciPy least squares and the internal solver
 # method =  0: use the internal solver (default)
 # method =  1: use SciPy least squares
 # method =  2: use SciPy minimizer
+# method =  3: use SciPy root, Powell's hybrid trust region method (bounds are checked on the solution)
+# method =  4: use SciPy least squares scaled by the jacobian, with more evaluations
+# method =  5: use SciPy least squares from several starting guesses (multi-start), the best solution is kept
+# method =  6: use SciPy newton krylov, jacobian-free for very large blocks, preconditioned by an incomplete LU if the sparsity is given
+# method =  7: fixed point by gauss-seidel sweeps with anderson acceleration, switches to newton if it contracts poorly,
+#              needs the sweep of the residual function (see SolverInterface.create_residual_func)
+# method = -2: race several methods at once, done by the SolverInterface since it owns the residual functions
+
+METHOD_RACE = -2
+METHOD_KRYLOV = 6
+METHOD_FIXED_POINT = 7
+
+METHOD_NAMES = {-2: 'race', -1: 'compare', 0: 'newton', 1: 'least squares', 2: 'minimize', 3: 'trust region',
+                4: 'scaled least squares', 5: 'multi-start', 6: 'newton krylov',
+                7: 'fixed point'}
+
+# starting guesses tried by multi-start, the first is the given one
+MULTISTART_POINTS = 8
+
+# previous iterates used by anderson acceleration, and the mean rate by which the fixed point steps must shrink
+ANDERSON_DEPTH = 5
+POOR_CONTRACTION = 0.9
+
 
+class SolverResult:
+    """
+    what a solver returns with full_output: the solution and how it got there
+    iterations of least squares are its jacobian evaluations, residual_norm is the 2-norm of the residuals at x
+    """
+    __slots__ = ('x', 'method', 'iterations', 'nfev', 'njev', 'residual_norm', 'converged')
+
+    def __init__(self, x, method: int, iterations: int, nfev: int, njev: int, residual_norm: float, converged: bool):
+        self.x = x
+        self.method = method
+        self.iterations = iterations
+        self.nfev = nfev
+        self.njev = njev
+        self.residual_norm = residual_norm
+        self.converged = converged
+
+    def __repr__(self):
+        return (f"SolverResult(method={self.method}, iterations={self.iterations}, nfev={self.nfev}, njev={self.njev}, "
+                f"residual_norm={self.residual_norm}, converged={self.converged})")
+
+
+def solver_wrapper(residual_func, initial_guesses, bounds=None, tol=1e-6, max_iter=500, verbose=False, method=0, full_output=False,
+                   sparsity=None, interruptible=False):
+    """
+    returns the solution, or a SolverResult if full_output
+    sparsity is None or for each residual the indices of the variables in it, used by newton krylov
+    interruptible: newton takes the jacobian by finite differences instead of autograd, one residual evaluation per
+    column, so checks in the residual function (time budgets) run while the jacobian is taken
+    """
+    import autograd.numpy as np
+    import scipy.optimize as sio
 
-def solver_wrapper(residual_func, initial_guesses: np.ndarray, bounds=None, tol=1e-6, max_iter=500, verbose=False, method=0):
     if method == 0:
-        return newton_raphson(residual_func, initial_guesses, bounds=bounds, tol=tol, max_iter=max_iter, verbose=verbose)
+        result = newton_raphson(residual_func, initial_guesses, bounds=bounds, tol=tol, max_iter=max_iter, verbose=verbose, full_output=True,
+                                finite_differences=interruptible)
     elif method == 1:
         res_sio = sio.least_squares(residual_func, initial_guesses, jac='2-point', bounds=bounds, method='trf', ftol=1e-08, xtol=1e-08, gtol=1e-08, x_scale=1.0, loss='linear', f_scale=1.0, diff_step=None, tr_solver=None, tr_options={}, jac_sparsity=None, max_nfev=max_iter*5, verbose=verbose, args=(), kwargs={})
-        return res_sio.x
+        result = SolverResult(res_sio.x, method, res_sio.njev, res_sio.nfev, res_sio.njev,
+                              float(np.linalg.norm(res_sio.fun)), bool(res_sio.success))
     elif method == 2:
         sio_bounds = [(lo, hi) for lo, hi in zip(*bounds)]
         sio_residual = lambda x: np.sum(np.power(residual_func(x), 2))
         res_sio = sio.minimize(sio_residual, initial_guesses, args=(), method=None, jac=None, hess=None, hessp=None, bounds=sio_bounds, constraints=(), tol=tol, callback=None, options=None)
-        return res_sio.x
+        result = SolverResult(res_sio.x, method, res_sio.nit, res_sio.nfev, res_sio.get('njev', 0),
+                              float(np.sqrt(res_sio.fun)), bool(res_sio.success))
+    elif method == 3:
+        res_sio = sio.root(residual_func, initial_guesses, method='hybr', options={'maxfev': max_iter * 5})
+        in_bounds = bounds is None or bool(np.all((res_sio.x >= bounds[0]) & (res_sio.x <= bounds[1])))
+        result = SolverResult(res_sio.x, method, res_sio.nfev, res_sio.nfev, res_sio.get('njev', 0),
+                              float(np.linalg.norm(res_sio.fun)), bool(res_sio.success) and in_bounds)
+    elif method == 4:
+        res_sio = sio.least_squares(residual_func, initial_guesses, jac='2-point', bounds=bounds, method='trf', x_scale='jac', max_nfev=max_iter * 20, verbose=verbose)
+        result = SolverResult(res_sio.x, method, res_sio.njev, res_sio.nfev, res_sio.njev,
+                              float(np.linalg.norm(res_sio.fun)), bool(res_sio.success))
+    elif method == 5:
+        result = multistart(residual_func, initial_guesses, bounds=bounds, tol=tol, max_iter=max_iter, verbose=verbose)
+    elif method == 6:
+        result = newton_krylov(residual_func, initial_guesses, bounds=bounds, tol=tol, max_iter=max_iter, verbose=verbose,
+                               sparsity=sparsity)
+    elif method == 7:
+        result = fixed_point(residual_func, initial_guesses, bounds=bounds, tol=tol, max_iter=max_iter, verbose=verbose,
+                             finite_differences=interruptible)
     elif method == -1:
-        res_int = solver_wrapper(residual_func, initial_guesses, bounds=bounds, tol=tol, max_iter=max_iter, verbose=verbose, method=0)
+        res_int = solver_wrapper(residual_func, initial_guesses, bounds=bounds, tol=tol, max_iter=max_iter, verbose=verbose, method=0, full_output=True)
         res_sio = solver_wrapper(residual_func, initial_guesses, bounds=bounds, tol=tol, max_iter=max_iter, verbose=verbose, method=1)
-        logging.error("Difference vs scipy: %s", str(res_sio - res_int))
-        return res_int
-    logging.error("No solver selected, returning an invalid result.")
-    return np.full_like(initial_guesses, np.NaN)
+        logging.error("Difference vs scipy: %s", str(res_sio - res_int.x))
+        result = res_int
+    else:
+        logging.error("No solver selected, returning an invalid result.")
+        result = SolverResult(np.full_like(initial_guesses, np.nan), method, 0, 0, 0, float('nan'), False)
+    return result if full_output else result.x
+
 
+def newton_raphson(residual_func, initial_guesses, bounds=None, tol=1e-6, max_iter=500, verbose=False, full_output=False,
+                   finite_differences=False):
+    """
+    returns the solution, or a SolverResult if full_output
+    the jacobian is taken by autograd, or by forward differences (a residual evaluation per column) if finite_differences
+    """
+    import autograd.numpy as np
+    from autograd import jacobian
 
-def newton_raphson(residual_func, initial_guesses: np.ndarray, bounds=None, tol=1e-6, max_iter=500, verbose=False):
     x = np.array(initial_guesses, dtype=float)
     res = residual_func(x)
 
-    jacobian_func = jacobian(residual_func)
+    if finite_differences:
+        jacobian_func = lambda x: forward_jacobian(residual_func, x, res)
+    else:
+        jacobian_func = jacobian(residual_func)
 
     for i in range(max_iter):
         J = jacobian_func(x)
@@ -56,4 +141,206 @@ def newton_raphson(residual_func, initial_guesses: np.ndarray, bounds=None, tol=
     else:
         raise RuntimeError(f"newton_raphson did not converge after {max_iter} iterations")
 
+    if full_output:
+        # the jacobian is taken once per iteration, and costs an evaluation of the residuals (or one per column) as well
+        jacobian_evaluations = len(x) if finite_differences else 1
+        return SolverResult(x, 0, i + 1, (jacobian_evaluations + 1) * (i + 1) + 1, i + 1, float(np.linalg.norm(res)), True)
     return x
+
+
+def forward_jacobian(residual_func, x, f0):
+    """ the jacobian by forward differences at x, where the residuals are f0 """
+    import numpy as np
+
+    x = np.asarray(x, dtype=float)
+    f0 = np.asarray(f0, dtype=float)
+    step = np.sqrt(np.finfo(float).eps) * np.maximum(np.abs(x), 1.0)
+    J = np.empty((len(f0), len(x)))
+    for column in range(len(x)):
+        x_step = x.copy()
+        x_step[column] += step[column]
+        J[:, column] = (np.asarray(residual_func(x_step), dtype=float) - f0) / step[column]
+    return J
+
+
+def multistart(residual_func, initial_guesses, bounds=None, tol=1e-6, max_iter=500, verbose=False, points=MULTISTART_POINTS):
+    """
+    least squares from the given starting guesses and from points-1 others, stops at the first solution with a
+    residual norm below tol, else returns the best one. the other starting guesses are spread around the given ones
+    (scaled by their magnitude) and clipped to the bounds, with a fixed seed so a solve can be repeated
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    x0 = np.asarray(initial_guesses, dtype=float)
+    scale = np.maximum(np.abs(x0), 1.0)
+
+    best = None
+    iterations = nfev = njev = 0
+    for point in range(points):
+        start = x0 if point == 0 else x0 + scale * rng.normal(0.0, 2.0 ** (point // 2), size=x0.shape)
+        if bounds is not None:
+            # least squares needs a start strictly inside finite bounds
+            start = np.clip(start, bounds[0], bounds[1])
+        result = solver_wrapper(residual_func, start, bounds=bounds, tol=tol, max_iter=max_iter, verbose=verbose,
+                                method=1, full_output=True)
+        iterations, nfev, njev = iterations + result.iterations, nfev + result.nfev, njev + result.njev
+        if best is None or result.residual_norm < best.residual_norm:
+            best = result
+        if result.converged and result.residual_norm <= tol:
+            break
+    return SolverResult(best.x, 5, iterations, nfev, njev, best.residual_norm, best.converged)
+
+
+def newton_krylov(residual_func, initial_guesses, bounds=None, tol=1e-6, max_iter=500, verbose=False, sparsity=None):
+    """
+    newton's method where the linear systems are solved by krylov iterations (lgmres), the jacobian is never formed
+    but applied to vectors by finite differences, so memory grows with the block size and not its square.
+    with sparsity the krylov iterations are preconditioned by an incomplete LU of the finite difference jacobian
+    at the starting guesses, which holds only the nonzeros. bounds are checked on the solution like trust region
+    """
+    import numpy as np
+    import scipy.optimize as sio
+    from scipy.sparse.linalg import LinearOperator, spilu
+
+    x0 = np.asarray(initial_guesses, dtype=float)
+    counts = {'nfev': 0, 'iterations': 0}
+
+    def func(x):
+        counts['nfev'] += 1
+        return residual_func(x)
+
+    def callback(x, f):
+        counts['iterations'] += 1
+
+    preconditioner = None
+    if sparsity is not None:
+        jacobian = sparse_jacobian(func, x0, sparsity)
+        try:
+            ilu = spilu(jacobian.tocsc(), drop_tol=1e-5, fill_factor=10)
+            preconditioner = LinearOperator(jacobian.shape, ilu.solve)
+        except RuntimeError:
+            # the factor is singular, solve without a preconditioner
+            pass
+
+    try:
+        x = sio.newton_krylov(func, x0, method='lgmres', inner_M=preconditioner, f_tol=tol, maxiter=max_iter,
+                              verbose=verbose, callback=callback)
+        converged = True
+    except sio.NoConvergence as e:
+        x, converged = np.asarray(e.args[0], dtype=float), False
+    in_bounds = bounds is None or bool(np.all((x >= bounds[0]) & (x <= bounds[1])))
+    residual_norm = float(np.linalg.norm(residual_func(x)))
+    return SolverResult(x, METHOD_KRYLOV, counts['iterations'], counts['nfev'], int(preconditioner is not None),
+                        residual_norm, converged and in_bounds)
+
+
+def sparse_jacobian(residual_func, x, sparsity):
+    """
+    finite difference jacobian as a sparse matrix, sparsity holds for each residual the indices of its variables.
+    columns which share no residual are grouped (greedily) and stepped together, so it takes one evaluation of the
+    residuals per group instead of per variable
+    """
+    import numpy as np
+    from scipy.sparse import csr_matrix, csc_matrix
+
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    counts = [len(columns) for columns in sparsity]
+    rows = np.repeat(np.arange(len(sparsity)), counts)
+    cols = np.fromiter((column for columns in sparsity for column in columns), dtype=np.int64, count=sum(counts))
+    pattern = csc_matrix((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(len(sparsity), n))
+
+    # residuals used by each group, a column joins the first group where none of its residuals is used
+    group = np.empty(n, dtype=np.int64)
+    used = []
+    for column in range(n):
+        column_rows = pattern.indices[pattern.indptr[column]:pattern.indptr[column + 1]]
+        for g, group_rows in enumerate(used):
+            if not group_rows[column_rows].any():
+                break
+        else:
+            g = len(used)
+            used.append(np.zeros(len(sparsity), dtype=bool))
+        used[g][column_rows] = True
+        group[column] = g
+
+    f0 = np.asarray(residual_func(x), dtype=float)
+    step = np.sqrt(np.finfo(float).eps) * np.maximum(np.abs(x), 1.0)
+    values = np.empty(len(rows))
+    entry_groups = group[cols]
+    for g in range(len(used)):
+        columns = group == g
+        x_step = x.copy()
+        x_step[columns] += step[columns]
+        difference = np.asarray(residual_func(x_step), dtype=float) - f0
+        entries = entry_groups == g
+        values[entries] = difference[rows[entries]] / step[cols[entries]]
+    return csr_matrix((values, (rows, cols)), shape=(len(sparsity), n))
+
+
+def fixed_point(residual_func, initial_guesses, bounds=None, tol=1e-6, max_iter=500, verbose=False,
+                depth=ANDERSON_DEPTH, contraction=POOR_CONTRACTION, finite_differences=False):
+    """
+    iterates x = sweep(x), the gauss-seidel sweep attached to the residual function, accelerated by anderson mixing
+    of the last depth iterates. suits recycle loops which converge by substitution, where a sweep is much cheaper than
+    a jacobian. once three iterations have passed and the steps shrink by less than contraction per iteration
+    on average, or an equation does not change with its matched variable, it goes on with newton from the sweep with
+    the smallest step (or the starting guesses), the result then has the method of newton
+    """
+    import numpy as np
+
+    sweep = getattr(residual_func, 'sweep', None)
+    if sweep is None:
+        raise ValueError("fixed point needs the sweep of the block, every equation must be matched to an unsolved variable")
+
+    x = np.asarray(initial_guesses, dtype=float)
+    best, best_norm = x, np.inf
+    previous_g = previous_f = None
+    # differences of the sweeps and their steps between iterates, the columns of the anderson least squares
+    dg, df = [], []
+    norms = []
+    nfev = 0
+    for i in range(max_iter):
+        try:
+            g = sweep(x)
+        except ZeroDivisionError:
+            # an equation does not depend on its matched variable here, substitution cannot go on
+            break
+        f = g - x
+        nfev += 1
+        norms.append(float(np.linalg.norm(f)))
+        if verbose:
+            print(f"Iteration {i + 1}: step norm {norms[-1]}")
+        if not np.isfinite(norms[-1]):
+            break
+        if norms[-1] < best_norm:
+            best, best_norm = g, norms[-1]
+        if norms[-1] <= tol:
+            residual_norm = float(np.linalg.norm(residual_func(g)))
+            nfev += 1
+            if residual_norm <= tol:
+                return SolverResult(g, METHOD_FIXED_POINT, i + 1, nfev, 0, residual_norm, True)
+        if len(norms) > 3 and (norms[-1] / norms[-4]) ** (1 / 3) > contraction:
+            break
+
+        if previous_g is not None:
+            dg.append(g - previous_g)
+            df.append(f - previous_f)
+            del dg[:-depth], df[:-depth]
+        previous_g, previous_f = g, f
+        if df:
+            gamma = np.linalg.lstsq(np.column_stack(df), f, rcond=None)[0]
+            x = g - np.column_stack(dg) @ gamma
+        else:
+            x = g
+        if bounds is not None:
+            x = np.clip(x, bounds[0], bounds[1])
+
+    if verbose:
+        print(f"Poor contraction after {len(norms)} iterations, continuing with newton")
+    result = newton_raphson(residual_func, best, bounds=bounds, tol=tol, max_iter=max_iter, verbose=verbose, full_output=True,
+                            finite_differences=finite_differences)
+    result.iterations += len(norms)
+    result.nfev += nfev
+    return result
@@ -1,8 +1,15 @@
 import ast
 import itertools
+import math
+import marshal
+import os
+import pickle
+import sys
+import threading
+from array import array
 from collections import defaultdict
 from collections import OrderedDict
-from PyQt6.QtCore import QObject, pyqtSignal
+from eqsys.observer import Signal
 
 
 class CreateResidual(ast.NodeTransformer):
@@ -55,26 +62,33 @@ class NameCollector(ast.NodeVisitor):
         self.current_function = False
 
 
-class Counter(QObject):
+class Counter:
     # todo: check if we can optimize
     """ 
     Keeps a count of the number of times the name is inserted
     Emits a signal the first time a name is added
     Emits a signal when an object name counter reaches 0 and removes that entry
+    While held, signals are collected and only the net changes are emitted on release
     """
-    name_added = pyqtSignal(str)
-    name_removed = pyqtSignal(str)
+    name_added = Signal()
+    name_removed = Signal()
 
     def __init__(self):
-        super().__init__()
         self.counter = defaultdict(int)
         self.objects = defaultdict()
 
+        # key: name, value: if the name was present when the counter was held
+        self._held = 0
+        self._pending = {}
+
     def _increase_counter(self, name: str):
         """ increases the counter by 1, or inserts if non-existing, since we have default dict """
         self.counter[name] += 1
         if self.counter[name] == 1:
-            self.name_added.emit(name)
+            if self._held:
+                self._pending.setdefault(name, False)
+            else:
+                self.name_added.emit(name)
 
     def _decrease_counter(self, name: str):
         # todo: bug can decrease key which does not exist, so it goes to negative
@@ -82,12 +96,36 @@ class Counter(QObject):
         self.counter[name] -= 1
         if self.counter[name] == 0:
             del self.counter[name]
+            if self._held:
+                # the associated object is kept until release, so receivers can still look it up
+                self._pending.setdefault(name, True)
+                return
             self.name_removed.emit(name)
             
             # check if there is an associated object
             if name in self.objects:
                 del self.objects[name]
 
+    def hold(self):
+        """ stop emitting signals until release is called the same number of times """
+        self._held += 1
+
+    def release(self):
+        """ emits the net changes since hold, names added and removed again are not emitted """
+        self._held -= 1
+        if self._held:
+            return
+
+        pending, self._pending = self._pending, {}
+        for name, was_present in pending.items():
+            is_present = name in self.counter
+            if is_present and not was_present:
+                self.name_added.emit(name)
+            elif was_present and not is_present:
+                self.name_removed.emit(name)
+            if not is_present and name in self.objects:
+                del self.objects[name]
+
     def insert(self, name: str, obj=None):
         """ insert and potentially add an object to be assoicated with the name """
         if obj:
@@ -101,11 +139,77 @@ class Counter(QObject):
         return self.objects[name]
 
 
+class SymbolTable:
+    """
+    interns names to small integer ids, ids are handed out once and never reused, so they stay valid for the system
+    ids only grow: a name which leaves the system keeps its id (and is given it again if it comes back),
+    so the table holds every name seen since the system was created and arrays indexed by id have len(table) rows
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name: str) -> int:
+        symbol = self.ids.get(name)
+        if symbol is None:
+            symbol = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol
+
+    def intern_all(self, names) -> array:
+        """ the ids as a compact array.array of ints """
+        return array('i', [self.intern(name) for name in names])
+
+    def name(self, symbol: int) -> str:
+        return self.names[symbol]
+
+
+class ChangeSet:
+    """
+    The consolidated changes to the equation system since the last commit
+    An object which is added and removed again is not part of the change set,
+    an object which is removed and added again is marked as changed
+    """
+    kinds = ('equations', 'parameters', 'variables', 'functions')
+
+    def __init__(self):
+        self.added = {kind: set() for kind in self.kinds}
+        self.removed = {kind: set() for kind in self.kinds}
+        self.changed = {kind: set() for kind in self.kinds}
+
+    def __repr__(self):
+        return f"ChangeSet(added={self.added}, removed={self.removed}, changed={self.changed})"
+
+    def __bool__(self):
+        return any(self.added[kind] or self.removed[kind] or self.changed[kind] for kind in self.kinds)
+
+    def add(self, kind: str, name: str):
+        if name in self.removed[kind]:
+            self.removed[kind].discard(name)
+            self.changed[kind].add(name)
+        else:
+            self.added[kind].add(name)
+
+    def remove(self, kind: str, name: str):
+        self.changed[kind].discard(name)
+        if name in self.added[kind]:
+            self.added[kind].discard(name)
+        else:
+            self.removed[kind].add(name)
+
+
 class LRUCache(OrderedDict):
     def __init__(self, capacity):
         self.capacity = capacity
         super().__init__()
 
+    def __reduce__(self):
+        return self.__class__, (self.capacity,), None, None, iter(self.items())
+
     def __setitem__(self, key, value):
         if key in self:
             self.move_to_end(key)
@@ -114,11 +218,143 @@ class LRUCache(OrderedDict):
         super().__setitem__(key, value)
 
 
-class GridManager(QObject):
-    data_updated = pyqtSignal()
+class CompiledLine:
+    """
+    What the factory derives from a line: the tree, the compiled code and the names in it
+    kind is equation or parameter, name is the name of the parameter, tree is None in compact mode
+    code objects are marshalled when pickled, since they cannot be pickled
+    """
+    __slots__ = ('kind', 'tree', 'code', 'objects', 'functions', 'name')
 
-    def __init__(self, parent=None):
-        super().__init__(parent)
+    def __init__(self, kind: str, tree: ast.AST, code, object_names: frozenset, function_names: frozenset, name: str = None):
+        self.kind = kind
+        self.tree = tree
+        self.code = code
+        self.objects = object_names
+        self.functions = function_names
+        self.name = name
+
+    def __repr__(self):
+        return f"CompiledLine(kind={self.kind}, name={self.name}, objects={set(self.objects)}, functions={set(self.functions)})"
+
+    def __getstate__(self):
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state['code'] = marshal.dumps(self.code)
+        return state
+
+    def __setstate__(self, state):
+        state['code'] = marshal.loads(state['code'])
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class CompileCache:
+    """
+    Content addressed cache of compiled lines
+    key is the normalized line (the ast.unparse form), so a line which is removed and added again (undo, cut/paste, reload)
+    is not parsed and compiled again. lines as written are mapped to their key as well, which also skips the parse.
+    Holds at most capacity lines, the least recently used is evicted
+    Safe to share between threads. If a path is given the cache can be saved and loaded again
+    """
+    # bump when CompiledLine changes, marshalled code is only valid for the interpreter version which wrote it
+    version = 2
+
+    def __init__(self, capacity=10000, path: str = None):
+        self.capacity = capacity
+        self.path = path
+
+        self._lines = OrderedDict()
+        self._keys = LRUCache(capacity)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __contains__(self, key: str):
+        return key in self._lines
+
+    def get(self, key: str) -> CompiledLine | None:
+        with self._lock:
+            compiled_line = self._lines.get(key)
+            if compiled_line is None:
+                self.misses += 1
+                return None
+            self._lines.move_to_end(key)
+            self.hits += 1
+            return compiled_line
+
+    def put(self, key: str, compiled_line: CompiledLine):
+        with self._lock:
+            if key in self._lines:
+                self._lines.move_to_end(key)
+            elif len(self._lines) >= self.capacity:
+                self._lines.popitem(last=False)
+                self.evictions += 1
+            self._lines[key] = compiled_line
+
+    def key_of(self, line: str) -> str | None:
+        """ the key of a line as written, if it has been seen before """
+        with self._lock:
+            return self._keys.get(line)
+
+    def set_key(self, line: str, key: str):
+        with self._lock:
+            self._keys[line] = key
+
+    def clear(self):
+        with self._lock:
+            self._lines.clear()
+            self._keys.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {'size': len(self._lines),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def save(self, path: str = None):
+        path = path or self.path
+        with self._lock:
+            state = {'version': (self.version, sys.implementation.cache_tag),
+                     'lines': list(self._lines.items()),
+                     'keys': list(self._keys.items())}
+        # write to a temporary file first, so a failed save does not leave a broken cache
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    def load(self, path: str = None) -> bool:
+        """ loads the cache, returns False if there is no cache or if it was written by another version """
+        path = path or self.path
+        if path is None or not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except Exception:
+            return False
+        if state.get('version') != (self.version, sys.implementation.cache_tag):
+            return False
+
+        for key, compiled_line in state['lines']:
+            self.put(key, compiled_line)
+        for line, key in state['keys']:
+            self.set_key(line, key)
+        return True
+
+
+class GridManager:
+    data_updated = Signal()
+
+    def __init__(self):
         self.variables = {}
 
     def _data_updated(self):
@@ -132,6 +368,10 @@ class GridManager(QObject):
         self.variables.clear()
         self._data_updated()
 
+    def size(self) -> int:
+        """ number of runs in the grid, without building it """
+        return math.prod(len(values) for values in self.variables.values())
+
     def get_grid(self):
         product = list(itertools.product(*self.variables.values()))
         keys = list(self.variables.keys())
@@ -1,9 +1,22 @@
 import sys
-from PyQt6.QtWidgets import QApplication
-from app import MainApp
+from controller.util import StartupReport
+
+report = StartupReport()
+
+with report.measure('import qt'):
+    from PyQt6.QtCore import Qt, QCoreApplication, QTimer
+    from PyQt6.QtWidgets import QApplication
+with report.measure('import app'):
+    from app import MainApp
 
 if __name__ == '__main__':
+    # the graph dock imports QtWebEngine after the application is created, which requires shared contexts
+    QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
-    PiES = MainApp()
+    # --eager-docks creates all docks at startup, --startup-report prints the time of each step
+    with report.measure('main app'):
+        PiES = MainApp(lazy_docks='--eager-docks' not in sys.argv, report=report)
     PiES.run()
+    if '--startup-report' in sys.argv:
+        QTimer.singleShot(0, lambda: print(report.report()))
     sys.exit(app.exec())
@@ -0,0 +1,43 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NAMESPACE = """\
+import time
+def slow(a):
+    time.sleep(0.05)
+    return a
+"""
+
+
+def solve(tmp_path, lines: list[str], *options, namespace_source=NAMESPACE) -> subprocess.CompletedProcess:
+    model, namespace = tmp_path / 'model.txt', tmp_path / 'ns.py'
+    model.write_text('\n'.join(lines))
+    namespace.write_text(namespace_source)
+    return subprocess.run([sys.executable, 'cli.py', 'solve', str(model), '--namespace', str(namespace),
+                           '--out', str(tmp_path / 'results.csv'), *options],
+                          cwd=ROOT, capture_output=True, text=True, env={**os.environ, 'PYTHONPATH': ROOT})
+
+
+def test_exit_status_of_a_solved_sweep(tmp_path):
+    result = solve(tmp_path, ["a = [1, 2, 3]", "x ** 2 == a"])
+    assert result.returncode == 0, result.stderr
+
+
+def test_exit_status_when_every_run_fails(tmp_path):
+    result = solve(tmp_path, ["a = [1, 2, 3]", "x ** 2 == -a"], '--fallbacks', '')
+    assert '3 of 3 runs failed' in result.stderr, result.stderr
+    assert result.returncode == 3
+
+
+def test_exit_status_when_budgets_are_exceeded(tmp_path):
+    result = solve(tmp_path, ["a = [1, 2]", "x ** 3 == slow(a)"], '--block-time', '0.01')
+    assert '2 of 2 runs failed' in result.stderr, result.stderr
+    assert result.returncode == 3
+
+
+def test_exit_status_of_a_namespace_which_cannot_be_read(tmp_path):
+    result = solve(tmp_path, ["a = [1, 2]", "x ** 3 == slow(a)"], namespace_source="def slow(a)\n")
+    assert result.returncode == 1
@@ -0,0 +1,116 @@
+import os
+import sys
+import subprocess
+from eqsys.solve.journal import Journal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODEL = """\
+a = [1, 2, 3, 4, 5, 6]
+b = [0.5, 1.5]
+x == a + y
+y == 2*x - f(a) * b
+z ** 3 + z == x + y
+"""
+
+# fails at a == 4 in the first sweep, and everywhere else when resumed, so resuming must replay the journal
+NAMESPACE = """\
+import os
+def f(a):
+    if a == 4 and os.environ.get('FAIL'):
+        raise RuntimeError('killed at 4')
+    if a != 4 and os.environ.get('RESUMED'):
+        raise RuntimeError('solved again')
+    return a
+"""
+
+KEY = """\
+from eqsys.equationsystem import EquationSystem
+from eqsys.lines import LinesManager, connect_lines_manager
+from eqsys.solve.plan import SolvePlan
+equation_system = EquationSystem()
+equation_system.namespace = {'f': lambda a: a}
+lines_manager = LinesManager()
+connect_lines_manager(lines_manager, equation_system)
+lines_manager.set_lines(open(%r).read().splitlines())
+plan = SolvePlan.compile(equation_system)
+print(plan.key, ','.join(plan.variables))
+"""
+
+
+def run(args, seed, **env):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True,
+                          env={**os.environ, 'PYTHONPATH': ROOT, 'PYTHONHASHSEED': str(seed), **env})
+
+
+def test_key_does_not_depend_on_hash_seed(tmp_path):
+    model = tmp_path / 'model.txt'
+    model.write_text(MODEL)
+    keys = set()
+    for seed in range(6):
+        result = run(['-c', KEY % str(model)], seed)
+        assert result.returncode == 0, result.stderr
+        keys.add(result.stdout.split()[0])
+    assert len(keys) == 1
+
+
+def test_rows_are_matched_by_column_name(tmp_path):
+    path = str(tmp_path / 'sweep.journal')
+    journal = Journal(path, ['a', 'b', 'c'])
+    journal.append(0, [1.0, 2.0, 3.0])
+    journal.close()
+
+    journal = Journal(path, ['c', 'a', 'b'], resume=True)
+    assert journal.rows == {0: [3.0, 1.0, 2.0]}
+    journal.append(1, [6.0, 4.0, 5.0])
+    journal.close()
+
+    journal = Journal(path, ['b', 'c', 'a'], resume=True)
+    assert journal.rows == {0: [2.0, 3.0, 1.0], 1: [5.0, 6.0, 4.0]}
+    journal.close()
+
+    # other columns are another sweep
+    journal = Journal(path, ['a', 'b', 'd'], resume=True)
+    assert journal.rows == {}
+    journal.close()
+
+
+def test_resume_in_a_new_process(tmp_path):
+    model, namespace, journal = tmp_path / 'model.txt', tmp_path / 'ns.py', tmp_path / 'journal'
+    model.write_text(MODEL)
+    namespace.write_text(NAMESPACE)
+    solve = ['cli.py', 'solve', str(model), '--namespace', str(namespace), '--journal', str(journal),
+             '--fallbacks', '']
+
+    first = run([*solve, '--out', str(tmp_path / 'first.csv')], 1, FAIL='1')
+    assert '2 of 12 runs failed' in first.stderr, first.stderr
+    assert len(os.listdir(journal)) == 1
+
+    resumed = run([*solve, '--out', str(tmp_path / 'resumed.csv'), '--resume'], 2, RESUMED='1')
+    assert 'runs failed' not in resumed.stderr, resumed.stderr
+    # the journal of the finished sweep is removed, no journal of another key is left behind
+    assert os.listdir(journal) == []
+
+
+def test_rows_are_not_resumed_after_the_namespace_was_edited(tmp_path):
+    model, namespace, journal = tmp_path / 'model.txt', tmp_path / 'ns.py', tmp_path / 'journal'
+    model.write_text(MODEL)
+    namespace.write_text(NAMESPACE)
+    solve = ['cli.py', 'solve', str(model), '--namespace', str(namespace), '--journal', str(journal),
+             '--fallbacks', '']
+
+    first = run([*solve, '--out', str(tmp_path / 'first.csv')], 1, FAIL='1')
+    assert '2 of 12 runs failed' in first.stderr, first.stderr
+
+    namespace.write_text("def f(a):\n    return a + 1\n")
+    resumed = run([*solve, '--out', str(tmp_path / 'resumed.csv'), '--resume'], 1)
+    assert 'runs failed' not in resumed.stderr, resumed.stderr
+    # every run is solved with the edited function, x == f(a) * b - a
+    with open(tmp_path / 'resumed.csv') as file:
+        header, *rows = [line.split(',') for line in file.read().splitlines()]
+    a, b, x = header.index('a'), header.index('b'), header.index('x')
+    assert len(rows) == 12
+    for row in rows:
+        assert abs(float(row[x]) - ((float(row[a]) + 1) * float(row[b]) - float(row[a]))) < 1e-6
+    # the journal of the first sweep is kept, it is another sweep
+    assert len(os.listdir(journal)) == 1
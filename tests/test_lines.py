@@ -0,0 +1,33 @@
+from eqsys.equationsystem import EquationSystem
+from eqsys.lines import LinesManager, connect_lines_manager
+
+
+def make_lines(lines: list[str]) -> tuple[LinesManager, EquationSystem]:
+    equation_system = EquationSystem()
+    equation_system.namespace = {}
+    lines_manager = LinesManager()
+    connect_lines_manager(lines_manager, equation_system)
+    lines_manager.set_lines(lines)
+    return lines_manager, equation_system
+
+
+def test_editing_the_value_of_a_parameter():
+    lines_manager, equation_system = make_lines(["a = 1", "x == a + 2"])
+    counts = dict(equation_system.eq_manager.object_counter.counter)
+    lines_manager.replace_lines(0, 1, ["a = 2"])
+
+    assert list(equation_system.parameters) == ['a']
+    assert eval(equation_system.parameters['a'].code) == 2
+    assert list(equation_system.variables) == ['x']
+    assert dict(equation_system.eq_manager.object_counter.counter) == counts
+
+
+def test_line_which_parses_to_the_same_line_is_not_removed():
+    lines_manager, equation_system = make_lines(["a=1", "x == a + 2"])
+    removed = []
+    lines_manager.remove_parameter.connect(removed.append)
+    lines_manager.replace_lines(0, 1, ["a = 1"])
+
+    assert removed == []
+    assert list(equation_system.parameters) == ['a']
+    assert lines_manager.map_line_to_parsed == {'a = 1': 'a = 1', 'x == a + 2': 'x == a + 2'}
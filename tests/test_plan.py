@@ -0,0 +1,78 @@
+import os
+import sys
+import math
+import pickle
+import subprocess
+import numpy as np
+from eqsys.equationsystem import EquationSystem
+from eqsys.lines import LinesManager, connect_lines_manager
+from eqsys.solve.plan import SolvePlan
+from eqsys.solve.result import ResultsManager
+from eqsys.solve.solver_interface import SolverInterface
+
+LINES = ["a = [1, 2, 3]",
+         "b = scale * 2",
+         "x == a + y",
+         "y ** 2 == f(x) + b"]
+
+NAMESPACE = """\
+import math
+scale = 0.5
+def f(x):
+    return math.sqrt(x * x + 1)
+"""
+
+
+def make_equation_system(namespace_source: str = None, namespace: dict = None) -> EquationSystem:
+    equation_system = EquationSystem()
+    if namespace_source is not None:
+        namespace = {}
+        exec(namespace_source, namespace)
+        del namespace['__builtins__']
+    equation_system.namespace = namespace
+    equation_system.namespace_source = namespace_source
+    lines_manager = LinesManager()
+    connect_lines_manager(lines_manager, equation_system)
+    lines_manager.set_lines(LINES)
+    return equation_system
+
+
+def solve(equation_system: EquationSystem, plan: SolvePlan) -> np.ndarray:
+    results_manager = ResultsManager()
+    SolverInterface(equation_system, results_manager).solve(plan=plan)
+    data = next(iter(results_manager.entries.values())).data.copy()
+    results_manager.close()
+    return data
+
+
+def test_pickled_plan_executes_the_namespace_source():
+    equation_system = make_equation_system(NAMESPACE)
+    plan = SolvePlan.compile(equation_system)
+    copy = pickle.loads(pickle.dumps(plan))
+
+    assert copy.key == plan.key
+    assert copy.variables == plan.variables
+    assert dict(copy.index) == dict(plan.index)
+    assert copy.namespace['b'] == 1.0 and copy.namespace['f'](0.0) == 1.0
+    assert [block.equations for block in copy.blocks] == [block.equations for block in plan.blocks]
+    assert [block.matching for block in copy.blocks] == [block.matching for block in plan.blocks]
+    with np.testing.assert_raises(AttributeError):
+        copy.x0 = None
+    assert np.array_equal(solve(equation_system, copy), solve(equation_system, plan))
+
+
+def test_pickled_plan_without_a_source_pickles_the_values():
+    equation_system = make_equation_system(namespace={'math': math, 'scale': 0.5, 'f': math.cosh})
+    plan = SolvePlan.compile(equation_system)
+    copy = pickle.loads(pickle.dumps(plan))
+
+    assert copy.key == plan.key
+    assert copy.namespace['math'] is math and copy.namespace['f'] is math.cosh
+    assert np.array_equal(solve(equation_system, copy), solve(equation_system, plan))
+
+
+def test_importing_the_solver_does_not_import_numpy():
+    code = "import sys, eqsys.solve.solver_interface; print('numpy' in sys.modules)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
@@ -0,0 +1,40 @@
+import os
+import numpy as np
+from eqsys.solve.result import DiskResultsEntry, ResultsEntry, ResultsManager
+
+
+def fill(entry):
+    """ rows which set some of the columns, with columns added after the first rows and a growth of the entry """
+    for i in range(7):
+        if i % 2 == 0:
+            entry.set_information('p', float(i))
+        if i >= 3:
+            entry.set_information('blocks', np.array([i, i + 1], np.int32))
+        if i == 5:
+            entry.set_information('late', i, 'int64')
+        entry.set_information('label', f"run {i}")
+        entry.add_results(['x'], [i])
+        entry.commit()
+
+
+def test_disk_entry_matches_memory_entry(tmp_path):
+    disk, memory = DiskResultsEntry(['x', 'y'], str(tmp_path), capacity=2), ResultsEntry(['x', 'y'], capacity=2)
+    fill(disk)
+    fill(memory)
+    assert np.array_equal(disk.data, memory.data, equal_nan=True)
+    assert disk.information.keys() == memory.information.keys()
+    for name, column in memory.information.items():
+        assert np.array_equal(disk.information[name], column, equal_nan=column.dtype.kind == 'f'), name
+    # numeric columns are mapped beside the data, the files of the entry before growing are removed
+    assert len(os.listdir(tmp_path)) == 4
+    disk.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_memory_limit_counts_information():
+    results_manager = ResultsManager(memory_limit=10 ** 8)
+    in_memory = results_manager.create_entry(['x'] * 10, capacity=200000)
+    on_disk = results_manager.create_entry(['x'] * 10, capacity=200000, information_bytes=5000)
+    assert type(results_manager.entries[in_memory]) is ResultsEntry
+    assert type(results_manager.entries[on_disk]) is DiskResultsEntry
+    results_manager.close()
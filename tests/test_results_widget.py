@@ -0,0 +1,32 @@
+from PyQt6.QtCore import Qt
+from eqsys.solve.result import ResultsEntry
+from view.widgets.results import ResultsTableModel
+
+
+def commit(entry: ResultsEntry, values: list[float], failure: int = 0):
+    entry.add_results(['x', 'y'], values)
+    entry.set_information('failure', failure, 'int64')
+    entry.commit()
+
+
+def test_model_inserts_the_rows_committed_since_the_last_refresh():
+    entry = ResultsEntry(['x', 'y'], capacity=2)
+    commit(entry, [1.0, 2.0])
+    model = ResultsTableModel(entry)
+    inserted = []
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+    assert (model.rowCount(), model.columnCount()) == (1, 2)
+
+    # the entry grows past its capacity
+    commit(entry, [3.0, 4.0])
+    commit(entry, [5.0, 6.0], failure=2)
+    assert model.rowCount() == 1
+    model.refresh()
+    model.refresh()
+    assert inserted == [(1, 2)]
+    assert model.rowCount() == 3
+
+    assert model.data(model.index(2, 1)) == '6.0'
+    assert model.data(model.index(2, 1), Qt.ItemDataRole.ToolTipRole) is None
+    assert model.headerData(1, Qt.Orientation.Horizontal) == 'y'
+    assert model.headerData(2, Qt.Orientation.Vertical, Qt.ItemDataRole.ToolTipRole) == 'failure: 2'
@@ -0,0 +1,77 @@
+import time
+import importlib
+import threading
+import numpy as np
+import autograd.numpy as anp
+from concurrent.futures import ThreadPoolExecutor
+from eqsys.equationsystem import EquationSystem
+from eqsys.lines import LinesManager, connect_lines_manager
+from eqsys.solve.cancel import FAILURE_BLOCK_TIME
+from eqsys.solve.result import ResultsManager
+from eqsys.solve.solver_interface import SolverInterface
+
+
+def make_solver(lines: list[str]) -> tuple[SolverInterface, ResultsManager]:
+    equation_system = EquationSystem()
+    equation_system.namespace = {'cos': anp.cos}
+    lines_manager = LinesManager()
+    connect_lines_manager(lines_manager, equation_system)
+    lines_manager.set_lines(lines)
+    results_manager = ResultsManager()
+    return SolverInterface(equation_system, results_manager), results_manager
+
+
+def test_block_time_is_kept_while_newton_takes_the_jacobian():
+    # one block of 200 coupled equations, where an autograd jacobian takes seconds
+    size = 200
+    solver, results_manager = make_solver(["a = [1, 2]"] + [f"x{i} == 0.5 * cos(x{(i + 1) % size}) + 0.01 * {i} + 0 * a"
+                                                            for i in range(size)])
+    solver.set_solver(0)
+    solver.settings['fallbacks'] = []
+    solver.settings['block_time'] = 0.3
+    solver.solve()
+
+    information = next(iter(results_manager.entries.values())).information
+    assert information['failure'].tolist() == [FAILURE_BLOCK_TIME] * 2
+    assert information['block_time'].max() < 1.0
+    results_manager.close()
+
+
+def test_race_waits_for_the_loser_and_counts_its_evaluations():
+    solver, results_manager = make_solver(["x == 1"])
+    solver.settings['max_iter'] = 10 ** 4
+    calls, started = [], threading.Event()
+
+    def slow(x):
+        # the loser never converges, each of its evaluations takes 50 ms
+        started.set()
+        time.sleep(0.05)
+        calls.append(time.perf_counter())
+        return x
+
+    def after_slow(x):
+        # the winner converges once the loser is in an evaluation
+        started.wait(1.0)
+        return x
+
+    namespace = {'slow': slow, 'after_slow': after_slow}
+    residuals = [compile("after_slow(x) - 2", '<string>', 'eval'), compile("slow(x) ** 2 + 1", '<string>', 'eval')]
+
+    def make_residual(check=None, counter=None):
+        return solver.create_residual_func([residuals.pop(0)], ['x'], namespace, {}, counter, check)
+
+    x0, lb, ub = np.array([1.0]), np.array([-np.inf]), np.array([np.inf])
+    # the solvers import scipy on first use
+    importlib.import_module('scipy.optimize')
+    solver._pool = ThreadPoolExecutor(max_workers=2)
+    start = time.perf_counter()
+    result, accepted, error = solver.race(make_residual, x0, lb, ub, [3, 0])
+    end = time.perf_counter()
+    solver._pool.shutdown()
+
+    assert accepted and result.method == 3 and abs(result.x[0] - 2.0) < 1e-9
+    # the loser ran until its next evaluation and none after the race returned
+    assert end - start < 0.5
+    assert calls and max(calls) < end
+    assert solver.progress.evaluations >= result.nfev + len(calls)
+    results_manager.close()
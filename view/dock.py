@@ -9,6 +9,10 @@ from PyQt6.QtCore import Qt, QSize
 class DockManager:
     def __init__(self, main_window):
         self.main_window = main_window
+        
+        # widgets set to docks, and factories for docks whose widget is created on first show
+        self.widgets = {}
+        self.factories = {}
         self.docks_map = {
             "Script": (Qt.DockWidgetArea.LeftDockWidgetArea, main_window.left_toolbar, False),
             "Plot": (Qt.DockWidgetArea.LeftDockWidgetArea, main_window.left_toolbar, False),
@@ -47,9 +51,10 @@ class DockManager:
 
         dock.topLevelChanged.connect(lambda top_level: self.on_dock_floating(dock, top_level))
 
+        # set before changing visibility, since visibilityChanged looks up the dock
+        self.docks_map[dock_name] = dock
         self.main_window.addDockWidget(position, dock)
         dock.setVisible(is_visible)
-        self.docks_map[dock_name] = dock
 
     def on_dock_visibility_changed(self, dock_name, visible):
         dock = self.docks_map[dock_name]
@@ -58,6 +63,8 @@ class DockManager:
         re_dock_button.setVisible(is_floating)
         
         if visible:
+            if dock_name in self.factories:
+                self.get_widget(dock_name)
             self.main_window.change_button_bg(dock_name, '#222222')
         else:
             self.main_window.reset_button_bg(dock_name)
@@ -77,6 +84,20 @@ class DockManager:
         dock_widget_content.setLayout(dock_layout)
 
         dock.setWidget(dock_widget_content)
+        self.widgets[dock_name] = new_widget
+
+    def set_dock_factory(self, dock_name, factory):
+        """ sets a function which creates the widget of the dock, it is called when the dock is first shown """
+        self.factories[dock_name] = factory
+        if self.docks_map[dock_name].isVisible():
+            self.get_widget(dock_name)
+
+    def get_widget(self, dock_name, create=True):
+        """ returns the widget of the dock, if create the widget is created from its factory if it has not been shown yet """
+        if create and dock_name in self.factories:
+            factory = self.factories.pop(dock_name)
+            self.set_dock_widget(dock_name, factory())
+        return self.widgets.get(dock_name)
 
     def re_dock(self, dock, position):
         dock.setFloating(False)
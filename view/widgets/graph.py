@@ -2,7 +2,6 @@ import os
 from PyQt6.QtCore import QUrl, pyqtSlot
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QDialog, QTextEdit, QGroupBox 
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-from pyvis.network import Network
 import json
 from PyQt6.QtWidgets import QGroupBox, QVBoxLayout, QPushButton, QHBoxLayout, QComboBox, QCheckBox
 from PyQt6.QtCore import Qt
@@ -104,6 +103,8 @@ class GraphWidget(QWidget):
         self.web_widget.page().runJavaScript(script)
             
     def create_equation_graph(self):
+        # pyvis is slow to import, so it is imported when a graph is first created
+        from pyvis.network import Network
         blocking_results, graph = self.eqsys.blocking(return_graph=True)
         val_results = self.eqsys.validation_handler.validate_blocks()
 
@@ -164,6 +165,7 @@ class GraphWidget(QWidget):
         return network.nodes, network.edges
 
     def create_block_graph(self):
+        from pyvis.network import Network
         blocking_results = self.eqsys.blocking()
         val_results = self.eqsys.validation_handler.validate_blocks()
 
@@ -35,6 +35,7 @@ class NamespaceWidget(QtWidgets.QWidget):
             exec(compiled_code, namespace)
             del namespace['__builtins__']
             self.eqsys.namespace = namespace
+            self.eqsys.namespace_source = code
         except (SyntaxError, Exception) as e:
             if isinstance(e, SyntaxError):
                 compile_error = str(e)
@@ -1,7 +1,6 @@
 from PyQt6 import QtCore, QtWidgets
 from PyQt6.QtWidgets import QMessageBox
 from PyQt6.QtCore import QSortFilterProxyModel
-from pint import UndefinedUnitError
 from PyQt6.QtWidgets import QComboBox, QPushButton, QHBoxLayout
 
 
@@ -39,6 +38,7 @@ class CustomTableModel(QtCore.QAbstractTableModel):
                     return False
 
             if column == "Unit":
+                from pint import UndefinedUnitError
                 try:
                     value = self.parent().eqsys.ureg.parse_units(value)
                 except UndefinedUnitError:
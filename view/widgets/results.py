@@ -1,8 +1,50 @@
-from PyQt6.QtWidgets import QWidget, QTabWidget, QTableWidget, QTableWidgetItem, QVBoxLayout, QPushButton, QInputDialog, QHBoxLayout, QDialog, QCheckBox, QLabel, QDialogButtonBox
-from PyQt6.QtCore import Qt
-from PyQt6.QtWidgets import QTabWidget, QTableWidget, QTableWidgetItem, QMenu, QVBoxLayout, QPushButton, QInputDialog, QHBoxLayout, QAbstractItemView
+from PyQt6.QtWidgets import QWidget, QTabWidget, QVBoxLayout, QPushButton, QInputDialog, QHBoxLayout, QDialog, QCheckBox, QLabel, QDialogButtonBox
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt6.QtWidgets import QTabWidget, QMenu, QVBoxLayout, QPushButton, QInputDialog, QHBoxLayout, QAbstractItemView
+from PyQt6.QtWidgets import QTableView
 from PyQt6.QtWidgets import QScrollArea, QLineEdit, QFormLayout
-from PyQt6.QtWidgets import QMessageBox
+from PyQt6.QtWidgets import QMessageBox, QFileDialog
+from eqsys.solve.export import export_entry
+from eqsys.solve.result import ResultsEntry
+
+
+class ResultsTableModel(QAbstractTableModel):
+    """
+    reads the cells from the array of the entry, cells are formatted when they are shown
+    the tooltip of a row header shows the metadata of the row
+    refresh appends the rows committed since the last refresh
+    """
+    def __init__(self, entry: ResultsEntry, parent=None):
+        super().__init__(parent)
+        self.entry = entry
+        self.rows = len(entry)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entry.variables)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and index.isValid():
+            return str(self.entry.data[index.row(), index.column()])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.entry.variables[section]
+        if role == Qt.ItemDataRole.ToolTipRole and orientation == Qt.Orientation.Vertical:
+            # the metadata of the row, e.g. grid parameters, failure and solve time
+            return "\n".join(f"{name}: {column[section]}" for name, column in self.entry.information.items()
+                             if column.ndim == 1)
+        return super().headerData(section, orientation, role)
+
+    def refresh(self):
+        rows = len(self.entry)
+        if rows > self.rows:
+            self.beginInsertRows(QModelIndex(), self.rows, rows - 1)
+            self.rows = rows
+            self.endInsertRows()
 
 
 class ResultsWidget(QWidget):
@@ -26,33 +68,56 @@ class ResultsWidget(QWidget):
         self.buttons_layout.addWidget(self.delete_button)
         self.buttons_layout.addWidget(self.select_variables_button)
         self.buttons_layout.addWidget(self.send_to_x0_button)
+        self.export_button = QPushButton('Export', self)
+        self.buttons_layout.addWidget(self.export_button)
         self.layout.addLayout(self.buttons_layout)
 
         self.rename_button.clicked.connect(self.rename_entry)
         self.delete_button.clicked.connect(self.delete_entry)
         self.select_variables_button.clicked.connect(self.select_variables)
         self.send_to_x0_button.clicked.connect(self.send_to_x0)
+        self.export_button.clicked.connect(self.export_entry)
 
-        self.results_manager.data_changed.connect(self.update_tabs)
+        # a table for each entry by name
+        self.tables = {}
+
+        # the results manager signals are connected by the main controller, since they are emitted from the solver thread
 
         self.show()
 
     def update_tabs(self):
+        """ recreates the tables of all entries """
         self.tabs.clear()
-        for entry_name, entry in self.results_manager.entries.items():
-            table = QTableWidget()
-
-            # Set up the table with the entry's data
-            table.setColumnCount(len(entry.variables))
-            table.setRowCount(len(entry.data))
-            table.setHorizontalHeaderLabels(entry.variables)
-            table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.tables.clear()
+        for entry_name in self.results_manager.entries:
+            self.on_entry_created(entry_name)
 
-            for i, row in enumerate(entry.data):
-                for j, item in enumerate(row):
-                    table.setItem(i, j, QTableWidgetItem(str(item)))
-
-            self.tabs.addTab(table, entry_name)
+    def on_entry_created(self, name: str):
+        entry = self.results_manager.entries.get(name)
+        if entry is None or name in self.tables:
+            return
+        table = QTableView()
+        table.setModel(ResultsTableModel(entry, table))
+        table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.tables[name] = table
+        self.tabs.addTab(table, name)
+
+    def on_entry_deleted(self, name: str):
+        table = self.tables.pop(name, None)
+        if table is not None:
+            self.tabs.removeTab(self.tabs.indexOf(table))
+            table.deleteLater()
+
+    def on_entry_renamed(self, old_name: str, new_name: str):
+        table = self.tables.pop(old_name, None)
+        if table is not None:
+            self.tables[new_name] = table
+            self.tabs.setTabText(self.tabs.indexOf(table), new_name)
+
+    def on_rows_committed(self, name: str):
+        table = self.tables.get(name)
+        if table is not None:
+            table.model().refresh()
 
     def rename_entry(self):
         index = self.tabs.currentIndex()
@@ -66,6 +131,19 @@ class ResultsWidget(QWidget):
             except KeyError as e:
                 QMessageBox.warning(self, 'Name Error', str(e))
 
+    def export_entry(self):
+        index = self.tabs.currentIndex()
+        if index < 0:
+            return
+        name = self.tabs.tabText(index)
+        path, _ = QFileDialog.getSaveFileName(self, "Export Entry", name,
+                                              "NumPy (*.npz);;Parquet (*.parquet);;Arrow (*.arrow *.feather);;CSV (*.csv)")
+        if path:
+            try:
+                export_entry(self.results_manager.entries[name], path)
+            except (ValueError, ImportError, OSError) as e:
+                QMessageBox.warning(self, 'Export Error', str(e))
+
     def delete_entry(self):
         index = self.tabs.currentIndex()
         name = self.tabs.tabText(index)
@@ -138,7 +216,7 @@ class ResultsWidget(QWidget):
 
         # Update the checked state of checkboxes based on the current column visibility
         table = self.tabs.widget(index)
-        column_visibility = [not table.isColumnHidden(i) for i in range(table.columnCount())]
+        column_visibility = [not table.isColumnHidden(i) for i in range(table.model().columnCount())]
         for checkbox, visible in zip(checkboxes, column_visibility):
             checkbox.setChecked(visible)
 
@@ -155,7 +233,7 @@ class ResultsWidget(QWidget):
         
         # Retrieve the selected rows
         table = self.tabs.currentWidget()
-        selected_rows = set(index.row() for index in table.selectedIndexes())
+        selected_rows = set(index.row() for index in table.selectionModel().selectedIndexes())
 
         if len(selected_rows) > 1:
             QMessageBox.warning(self, 'Selection error', 'Please select only one row.')
@@ -187,16 +265,19 @@ class ResultsWidget(QWidget):
         # Variables with value as 'None'
         none_variables = []
 
+        updated_values = []
         for variable, value in variable_dict.items():
-            if value == 'None':
+            # unsolved variables are nan in the entry
+            if value == 'None' or value != value:
                 none_variables.append(variable)
                 continue
 
             if variable in self.eqsys.variables:
-                self.eqsys.eq_manager.set_attr(variable, 'Variables', 'starting_guess', value)
                 updated_variables.append(variable)
+                updated_values.append(value)
             else:
                 invalid_variables.append(variable)
+        self.eqsys.eq_manager.set_starting_guesses(updated_variables, updated_values)
         self.eqsys._on_change()
         # Construct error message
         error_message = ""
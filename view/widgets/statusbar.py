@@ -7,8 +7,10 @@ class StatusBarWidget(QWidget):
     def __init__(self, solver_interface, parent=None):
         super().__init__(parent)
         
+        # solve status is connected by the main controller, since it is emitted from the solver thread
+        # while solving, the progress of the solver interface is polled with the timer,
+        # which also flushes the rows the results manager held back, so the results are not stale during slow points
         self.solver_interface = solver_interface
-        self.solver_interface.solve_status.connect(self.update_solve_status)
         
         # layout
         self.layout = QHBoxLayout(self)
@@ -55,6 +57,11 @@ class StatusBarWidget(QWidget):
         # Update the time label with the elapsed time
         self.time_label.setText(formatted_time)
 
+        progress = self.solver_interface.progress
+        if progress.running:
+            self.status_label.setText(progress.message())
+        self.solver_interface.results_manager.flush_notifications()
+
     @staticmethod
     def format_time(milliseconds: int) -> str:
         # Format the elapsed time in hours, minutes, and seconds
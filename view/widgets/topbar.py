@@ -115,6 +115,15 @@ class TopBarWidget(QWidget):
         self.layout.addWidget(self.solve_runs_label)
         self.layout.addWidget(self.solve_button)
 
+        # continues a sweep which did not finish
+        self.resume_button = QPushButton('Resume')
+        pixmapi = QStyle.StandardPixmap.SP_MediaSeekForward
+        icon = self.style().standardIcon(pixmapi)
+        self.resume_button.setIcon(QIcon(icon))
+        self.resume_button.setObjectName("resumeButton")
+        self.resume_button.setToolTip('Solve the runs which were not solved when the last sweep failed or was stopped')
+        self.layout.addWidget(self.resume_button)
+
         # Add the solve button and labelx4
         self.stop_button = QPushButton()
         pixmapi = QStyle.StandardPixmap.SP_MediaStop
@@ -212,7 +221,7 @@ class TopBarWidget(QWidget):
         elif dof > 0 or dof < 0:  # possibly over/under determined
             self.eq_info_widget.change_light_color('yellow')
 
-        grid_len = len(self.eqsys.grid.get_grid())
+        grid_len = self.eqsys.grid.size()
         self.refresh_solve_button(grid_len)
 
     def refresh_solve_button(self, runs: int):